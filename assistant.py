@@ -1,8 +1,9 @@
 from transformers import AutoModelForSeq2SeqLM, AutoTokenizer
-import torch
-import yfinance as yf
 import re
 import random
+from market_data import get_provider
+from decoding import DECODING_PROFILES, DEFAULT_PROFILE, generate_with_budget, get_deadline_stats
+from profiling import profiler_from_env
 
 # Load pre-trained FLAN-T5 model and tokenizer
 model_name = "google/flan-t5-base"  # Using base instead of small for better results
@@ -12,6 +13,9 @@ model = AutoModelForSeq2SeqLM.from_pretrained(model_name)
 # Dictionary to store user-provided data
 user_data = {}
 
+# Sampling profiler for slow turns, off unless PROFILE_SAMPLE_RATE is set or "capture next" is used
+profiler = profiler_from_env()
+
 # Pre-defined responses for common financial questions
 FINANCIAL_RESPONSES = {
     "investment_advice": [
@@ -33,21 +37,19 @@ FINANCIAL_RESPONSES = {
 
 def get_stock_price(ticker):
     """
-    Fetch the latest stock price using the yfinance library.
+    Fetch the latest stock price from the configured market-data provider.
     """
     try:
-        stock = yf.Ticker(ticker)
-        history = stock.history(period="1d")
-        if history.empty:
+        provider = get_provider()
+        price = provider.get_quote(ticker)
+        if price is None:
             return {
                 "success": False,
                 "message": f"Could not find data for ticker symbol {ticker}."
             }
-            
-        price = history["Close"].iloc[-1]
         
         # Get additional information
-        info = stock.info
+        info = provider.get_info(ticker)
         company_name = info.get('shortName', ticker.upper())
         
         return {
@@ -83,9 +85,15 @@ def is_investment_advice_question(question):
             return True
     return False
 
-def ask_question(question, context=""):
+def ask_question(question, context="", profile=DEFAULT_PROFILE, budget_s=None):
     """
     Generate a response using FLAN-T5 based on user-provided financial context.
+
+    profile selects one of the named decoding profiles in decoding.py and
+    budget_s overrides that profile's wall-time budget in seconds.
+
+    Returns a dict with the response text and the intent that answered, so
+    profiles captured for the turn are tagged with how it was routed.
     """
     # Check if the question is asking for investment advice
     if is_investment_advice_question(question):
@@ -95,10 +103,12 @@ def ask_question(question, context=""):
         
         if ticker_match:
             # This is about a specific stock
-            return get_predefined_response("stock_advice") + "\n\nRemember that past performance is not indicative of future results, and all investments carry risk."
+            response = get_predefined_response("stock_advice") + "\n\nRemember that past performance is not indicative of future results, and all investments carry risk."
+            return {"response": response, "intent": "stock_advice"}
         else:
             # General investment advice
-            return get_predefined_response("investment_advice") + "\n\nIt's important to do your own research or consult with a financial advisor before making investment decisions."
+            response = get_predefined_response("investment_advice") + "\n\nIt's important to do your own research or consult with a financial advisor before making investment decisions."
+            return {"response": response, "intent": "investment_advice"}
     
     # Check if the question is about stock prices
     stock_pattern = re.compile(r'(?:price|value|quote|stock) (?:of|for) ([A-Za-z]+)')
@@ -116,9 +126,7 @@ def ask_question(question, context=""):
         if stock_data["success"]:
             # Store the stock data for future reference
             user_data[f"stock_{ticker}"] = f"${stock_data['price']:.2f}"
-            return stock_data["message"]
-        else:
-            return stock_data["message"]
+        return {"response": stock_data["message"], "intent": "stock"}
     
     # Create a more structured prompt with clear instructions and examples
     full_prompt = f"""
@@ -142,32 +150,23 @@ Your response:
     # Tokenize with appropriate settings
     inputs = tokenizer(full_prompt, return_tensors="pt", padding=True, truncation=True, max_length=512)
     
-    # Generate with better parameters
-    with torch.no_grad():
-        output = model.generate(
-            **inputs, 
-            max_length=200,
-            min_length=40,  # Set minimum length to avoid extremely short responses
-            do_sample=True,  # Enable sampling for more diverse responses
-            top_p=0.90,      # Nucleus sampling parameter
-            top_k=50,        # Limit vocabulary to top k tokens
-            temperature=0.7, # Control randomness (lower = more focused)
-            repetition_penalty=1.2  # Penalize repetition
-        )
-    
-    response = tokenizer.decode(output[0], skip_special_tokens=True)
+    # Generate within the latency budget of the chosen decoding profile
+    response, _ = generate_with_budget(model, tokenizer, inputs, profile=profile, budget_s=budget_s)
     
     # Filter out problematic responses
     if len(response) < 30 or response == question or response.lower() in question.lower():
         # Fall back to predefined responses if the model gives a poor answer
         if "invest" in question.lower() or "stock" in question.lower():
-            return get_predefined_response("investment_advice")
+            return {"response": get_predefined_response("investment_advice"), "intent": "generate_fallback"}
         elif "save" in question.lower() or "saving" in question.lower():
-            return get_predefined_response("savings")
+            return {"response": get_predefined_response("savings"), "intent": "generate_fallback"}
         else:
-            return "Based on the information provided, I'd need more details to give you a helpful answer on this topic. Could you provide more specifics about your financial situation and goals?"
+            return {
+                "response": "Based on the information provided, I'd need more details to give you a helpful answer on this topic. Could you provide more specifics about your financial situation and goals?",
+                "intent": "generate_fallback"
+            }
     
-    return response
+    return {"response": response, "intent": "generate"}
 
 # Handle multi-line input for financial data
 def process_set_command(command):
@@ -185,6 +184,11 @@ print("- Set your financial data using 'set key: value'")
 print("- Type 'show data' to see all your stored information")
 print("- Get stock prices with 'get stock TICKER' or 'what's the price of TICKER'")
 print("- Ask any financial question based on your data")
+print(f"- Switch decoding profile with 'profile NAME' ({', '.join(DECODING_PROFILES)})")
+print("- Type 'show stats' to see how often responses hit the latency budget")
+print(f"- Type 'capture next' to save a sampling profile of the next answer to {profiler.output_dir}")
+
+decoding_profile = DEFAULT_PROFILE
 
 while True:
     user_input = input("\nYou: ")
@@ -202,6 +206,32 @@ while True:
                 print(f"- {key}: {value}")
         continue
     
+    elif user_input.lower().startswith("profile "):
+        name = user_input[8:].strip().lower()
+        if name in DECODING_PROFILES:
+            decoding_profile = name
+            print(f"✅ Decoding profile set to {name}")
+        else:
+            print(f"Unknown profile! Choose from: {', '.join(DECODING_PROFILES)}")
+        continue
+    
+    elif user_input.lower() == "show stats":
+        stats = get_deadline_stats()
+        if not stats:
+            print("No responses have been generated yet.")
+        else:
+            print("\n⏱️ Decoding Stats:")
+            for name, entry in stats.items():
+                print(f"- {name}: {entry['requests']} responses, {entry['deadline_stops']} cut short by the deadline "
+                      f"({entry['deadline_stop_rate']:.0%}), avg {entry['avg_seconds']:.2f}s")
+        continue
+    
+    elif user_input.lower() == "capture next":
+        profiler.enabled = True
+        profiler.select(None)
+        print("✅ The next answer will be profiled")
+        continue
+    
     elif user_input.lower().startswith("set "):
         success, message = process_set_command(user_input)
         print(message)
@@ -211,6 +241,7 @@ while True:
     context_string = "\n".join([f"- {k}: {v}" for k, v in user_data.items()])
     
     # Generate response
-    response = ask_question(user_input, context=context_string)
+    result = profiler.run(ask_question, user_input, context=context_string, profile=decoding_profile,
+                          tags={"question": user_input, "decoding_profile": decoding_profile})
     
-    print("💬 Assistant:", response)
\ No newline at end of file
+    print("💬 Assistant:", result["response"])
\ No newline at end of file
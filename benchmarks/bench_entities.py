@@ -0,0 +1,79 @@
+"""
+Correctness and per-message cost of the numeric entity extractor.
+
+Every question in entity_corpus.json is run through entities.summarize and
+compared with its expected amount, rate, term_months and monthly_contribution.
+The script exits with status 1 if any case is wrong, then times the extractor
+over the whole corpus and reports the mean and p99 cost per message.
+
+Usage (from the repository root):
+    python -m benchmarks.bench_entities
+    python -m benchmarks.bench_entities --rounds 2000
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+from entities import summarize
+
+CORPUS_PATH = os.path.join(os.path.dirname(__file__), "entity_corpus.json")
+FIELDS = ["amount", "rate", "term_months", "monthly_contribution"]
+
+
+def matches(got, expected):
+    if got is None or expected is None:
+        return got is None and expected is None
+    return abs(got - expected) < 1e-6
+
+
+def check(corpus):
+    failures = []
+    for case in corpus:
+        got = summarize(case["text"])
+        wrong = {f: (got[f], case["expected"][f]) for f in FIELDS if not matches(got[f], case["expected"][f])}
+        if wrong:
+            failures.append((case["text"], wrong))
+    return failures
+
+
+def time_per_message(corpus, rounds):
+    texts = [case["text"] for case in corpus]
+    timings = np.empty(rounds * len(texts))
+    i = 0
+    for _ in range(rounds):
+        for text in texts:
+            start = time.perf_counter()
+            summarize(text)
+            timings[i] = time.perf_counter() - start
+            i += 1
+    return timings * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check and time the numeric entity extractor.")
+    parser.add_argument("--rounds", type=int, default=500)
+    args = parser.parse_args()
+
+    with open(CORPUS_PATH) as f:
+        corpus = json.load(f)
+
+    failures = check(corpus)
+    for text, wrong in failures:
+        print(f"FAIL: {text}")
+        for field, (got, expected) in wrong.items():
+            print(f"    {field}: got {got}, expected {expected}")
+    print(f"{len(corpus) - len(failures)}/{len(corpus)} cases correct")
+    if failures:
+        sys.exit(1)
+
+    timings = time_per_message(corpus, args.rounds)
+    print(f"{len(timings)} messages: mean {timings.mean():.1f} µs, "
+          f"p50 {np.percentile(timings, 50):.1f} µs, p99 {np.percentile(timings, 99):.1f} µs")
+
+
+if __name__ == "__main__":
+    main()
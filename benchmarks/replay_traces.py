@@ -0,0 +1,196 @@
+"""
+Replay recorded chat traces against the assistant engine.
+
+Turns captured with TRACE_FILE (see tracing.py) are replayed through
+engine.ask_question on a pool of worker threads, the same way Streamlit runs
+each session's script on its own thread. Market data comes from the offline
+ReplayProvider; missing fixtures are synthesised. Each turn gets a fresh
+session rebuilt from its hashed profile snapshot: the same number of data
+keys, holdings, debts and watchlist tickers, with synthetic values.
+
+Arrivals are open-loop. Latency is measured from each turn's scheduled arrival,
+so time spent queueing for a free worker counts towards it.
+- --rate R: Poisson arrivals at R turns per second
+- --speed S: recorded inter-arrival gaps, S times faster
+- neither: every turn arrives at once and the pool runs flat out
+
+Usage (from the repository root):
+    python -m benchmarks.replay_traces logs/traces.jsonl
+    python -m benchmarks.replay_traces logs/traces.jsonl --concurrency 16 --rate 40 --latency-ms 150
+    python -m benchmarks.replay_traces logs/traces.jsonl --speed 10 --repeat 5
+"""
+import argparse
+import json
+import os
+import random
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from engine import Session, ask_question, extract_ticker_from_question
+from market_data import DEFAULT_FIXTURE_DIR, ReplayProvider, set_provider, synthesize_fixtures
+from tracing import load_traces
+
+SYNTHETIC_TICKERS = ["AAPL", "MSFT", "GOOGL", "AMZN", "NVDA", "TSLA", "META", "JPM", "V", "KO"]
+PERCENTILES = [50, 90, 99, 99.9]
+
+
+def session_for(profile):
+    """Build a session with the same shape as a traced profile snapshot."""
+    profile = profile or {}
+    user_data = {"monthly_income": "$5,000 per month"} if profile.get("user_data_keys") else {}
+    for i in range(len(user_data), profile.get("user_data_keys", 0)):
+        user_data[f"item_{i}"] = f"${1000 * (i + 1):,}"
+    holdings = [
+        {"ticker": SYNTHETIC_TICKERS[i % len(SYNTHETIC_TICKERS)], "shares": 10.0, "cost_basis": 100.0}
+        for i in range(profile.get("holdings", 0))
+    ]
+    debts = [
+        {"name": f"Debt {i + 1}", "balance": 2000.0 * (i + 1), "apr": 5.0 + 3 * i, "minimum": 50.0}
+        for i in range(profile.get("debts", 0))
+    ]
+    watchlist = [SYNTHETIC_TICKERS[i % len(SYNTHETIC_TICKERS)] for i in range(profile.get("watchlist", 0))]
+    return Session(user_data, holdings, debts, list(dict.fromkeys(watchlist)))
+
+
+def prepare_fixtures(turns, fixture_dir):
+    """Synthesise fixtures for any ticker the turns will touch that has none yet."""
+    tickers = set(SYNTHETIC_TICKERS)
+    tickers.update(t for t in (extract_ticker_from_question(turn["question"]) for turn in turns) if t)
+    missing = sorted(t for t in tickers if not os.path.isdir(os.path.join(fixture_dir, t)))
+    if missing:
+        synthesize_fixtures(missing, fixture_dir)
+    return missing
+
+
+def arrival_offsets(turns, rate=None, speed=None, seed=0):
+    """Seconds after the start at which each turn arrives."""
+    if rate:
+        gaps = np.random.default_rng(seed).exponential(1 / rate, len(turns))
+        return np.concatenate([[0.0], np.cumsum(gaps[1:])])
+    if speed:
+        stamps = np.array([turn.get("ts", 0) for turn in turns], dtype=float)
+        return (stamps - stamps[0]) / speed
+    return np.zeros(len(turns))
+
+
+def replay(turns, concurrency, offsets):
+    """Run every turn at its offset on `concurrency` threads and return one record per turn."""
+    results = [None] * len(turns)
+
+    def run(i, scheduled):
+        started = time.perf_counter()
+        try:
+            result = ask_question(turns[i]["question"], session_for(turns[i].get("profile")))
+            error = None
+        except Exception as e:
+            result, error = None, f"{type(e).__name__}: {e}"
+        finished = time.perf_counter()
+        results[i] = {
+            "latency_ms": (finished - scheduled) * 1000,
+            "service_ms": (finished - started) * 1000,
+            "intent": result["intent"] if result else None,
+            "recorded_intent": turns[i].get("intent"),
+            "timings": result["timings"] if result else {},
+            "error": error
+        }
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="replay") as pool:
+        for i, offset in enumerate(offsets):
+            scheduled = start + offset
+            delay = scheduled - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            pool.submit(run, i, scheduled)
+    return results, time.perf_counter() - start
+
+
+def summarize(results, elapsed):
+    latencies = np.array([r["latency_ms"] for r in results if not r["error"]])
+    service = np.array([r["service_ms"] for r in results if not r["error"]])
+    by_intent = defaultdict(list)
+    stages = defaultdict(list)
+    for r in results:
+        if r["error"]:
+            continue
+        by_intent[r["intent"]].append(r["latency_ms"])
+        for stage, ms in r["timings"].items():
+            stages[stage].append(ms)
+    return {
+        "turns": len(results),
+        "errors": sum(1 for r in results if r["error"]),
+        "intent_changed": sum(1 for r in results if r["recorded_intent"] and r["intent"] != r["recorded_intent"]),
+        "elapsed_s": elapsed,
+        "throughput": len(latencies) / elapsed if elapsed > 0 else float("nan"),
+        "latency_ms": {f"p{p:g}": float(np.percentile(latencies, p)) for p in PERCENTILES} if len(latencies) else {},
+        "latency_max_ms": float(latencies.max()) if len(latencies) else None,
+        "service_ms": {f"p{p:g}": float(np.percentile(service, p)) for p in PERCENTILES} if len(service) else {},
+        "intents": {
+            intent: {"count": len(values), "p50": float(np.percentile(values, 50)), "p99": float(np.percentile(values, 99))}
+            for intent, values in sorted(by_intent.items(), key=lambda item: -len(item[1]))
+        },
+        "stage_mean_ms": {stage: float(np.mean(values)) for stage, values in stages.items()}
+    }
+
+
+def print_report(report):
+    print(f"{report['turns']} turns in {report['elapsed_s']:.2f}s: {report['throughput']:.1f} turns/s, "
+          f"{report['errors']} error(s), {report['intent_changed']} routed to a different intent than recorded\n")
+    print(f"{'':<14}" + "".join(f"{name:>10}" for name in report["latency_ms"]) + f"{'max':>10}")
+    print(f"{'Latency ms':<14}" + "".join(f"{v:>10.1f}" for v in report["latency_ms"].values())
+          + f"{report['latency_max_ms']:>10.1f}")
+    print(f"{'Service ms':<14}" + "".join(f"{v:>10.1f}" for v in report["service_ms"].values()) + "\n")
+    print(f"{'Intent':<18}{'Count':>7}{'p50 ms':>10}{'p99 ms':>10}")
+    for intent, row in report["intents"].items():
+        print(f"{intent:<18}{row['count']:>7}{row['p50']:>10.1f}{row['p99']:>10.1f}")
+    print(f"\n{'Stage':<18}{'Mean ms':>10}")
+    for stage, mean in sorted(report["stage_mean_ms"].items(), key=lambda item: -item[1]):
+        print(f"{stage:<18}{mean:>10.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay recorded chat traces against the assistant engine.")
+    parser.add_argument("trace", help="Trace file written with TRACE_FILE (rotated backups are read too)")
+    parser.add_argument("--concurrency", type=int, default=8)
+    arrivals = parser.add_mutually_exclusive_group()
+    arrivals.add_argument("--rate", type=float, default=None, help="Poisson arrival rate in turns per second")
+    arrivals.add_argument("--speed", type=float, default=None, help="Replay recorded arrival gaps this many times faster")
+    parser.add_argument("--repeat", type=int, default=1, help="Replay the trace this many times back to back")
+    parser.add_argument("--limit", type=int, default=None)
+    parser.add_argument("--fixtures", default=DEFAULT_FIXTURE_DIR)
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    parser.add_argument("--jitter-ms", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", default=None, help="Also write the report to this file")
+    args = parser.parse_args()
+
+    turns = load_traces(args.trace)[:args.limit]
+    if not turns:
+        parser.error(f"No turns found in {args.trace}")
+    if args.repeat > 1:
+        span = turns[-1].get("ts", 0) - turns[0].get("ts", 0) + 1
+        turns = [dict(turn, ts=turn.get("ts", 0) + k * span) for k in range(args.repeat) for turn in turns]
+
+    missing = prepare_fixtures(turns, args.fixtures)
+    if missing:
+        print(f"Synthesised fixtures for {', '.join(missing)} in {args.fixtures}")
+    # Same stack as the app: coalescing and a stale-while-revalidate cache over the replayed data
+    set_provider(ReplayProvider(args.fixtures, args.latency_ms, args.jitter_ms, seed=args.seed), coalesce=True, cache=True)
+    random.seed(args.seed)
+
+    offsets = arrival_offsets(turns, rate=args.rate, speed=args.speed, seed=args.seed)
+    results, elapsed = replay(turns, args.concurrency, offsets)
+    report = summarize(results, elapsed)
+    print_report(report)
+    for r in [r for r in results if r["error"]][:5]:
+        print(f"Error: {r['error']}")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
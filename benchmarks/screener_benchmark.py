@@ -0,0 +1,82 @@
+"""
+Screener benchmark: one vectorised pass over the price universe versus a
+per-ticker pandas loop over the same histories.
+
+Synthesises fixtures for N tickers, loads them into a PriceUniverse and times
+a "top 10 gainers this week above $50" screen both ways. The baseline is what
+a handler built on per-ticker history lookups would do.
+
+Usage (from the repository root):
+    python -m benchmarks.screener_benchmark
+    python -m benchmarks.screener_benchmark --tickers 5000 --repeat 50
+"""
+import argparse
+import tempfile
+import time
+
+import numpy as np
+
+from market_data import ReplayProvider, synthesize_fixtures
+from universe import PriceUniverse, screen
+
+WINDOW = 5
+FILTERS = [("change", ">", 0.0), ("price", ">", 50.0)]
+LIMIT = 10
+
+
+def loop_screen(histories):
+    """Baseline: compute the change per ticker from its DataFrame, then sort in Python."""
+    rows = []
+    for ticker, history in histories.items():
+        closes = history["Close"]
+        price = closes.iloc[-1]
+        change = (price / closes.iloc[-1 - WINDOW] - 1) * 100
+        if change > 0 and price > 50:
+            rows.append((change, ticker))
+    return [ticker for _, ticker in sorted(rows, reverse=True)[:LIMIT]]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the vectorised screener.")
+    parser.add_argument("--tickers", type=int, default=3000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as fixture_dir:
+        tickers = [f"T{i:05d}" for i in range(args.tickers)]
+        print(f"Synthesising {len(tickers)} fixtures...")
+        synthesize_fixtures(tickers, fixture_dir)
+        provider = ReplayProvider(fixture_dir)
+
+        universe = PriceUniverse(provider=provider)
+        start = time.perf_counter()
+        universe.ensure(tickers)
+        load_s = time.perf_counter() - start
+        block = universe.snapshot.block
+        print(f"Loaded {block.shape[1]} tickers x {block.shape[2]} days in {load_s:.2f}s, "
+              f"{universe.nbytes() / 1e6:.1f} MB block (contiguous: {block.flags['C_CONTIGUOUS']})\n")
+
+        histories = {t: provider.get_history(t) for t in tickers}
+
+        timings = {}
+        for name, run in [
+            ("vectorised", lambda: screen(universe, window=WINDOW, filters=FILTERS, limit=LIMIT)["Ticker"].tolist()),
+            ("per-ticker loop", lambda: loop_screen(histories))
+        ]:
+            result = run()
+            samples = []
+            for _ in range(args.repeat):
+                start = time.perf_counter()
+                run()
+                samples.append((time.perf_counter() - start) * 1000)
+            timings[name] = (float(np.median(samples)), result)
+
+        print(f"{'Screen':<18}{'Median ms':>12}")
+        for name, (ms, _) in timings.items():
+            print(f"{name:<18}{ms:>12.2f}")
+        vectorised, loop = timings["vectorised"], timings["per-ticker loop"]
+        print(f"\nSpeedup: {loop[0] / vectorised[0]:.0f}x, same top {LIMIT}: {vectorised[1] == loop[1]}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""
+Memory and throughput of the multi-process model server by worker count.
+
+For each worker count the benchmark starts a ModelServer, records each
+worker's RSS and USS, and sends a fixed batch of prompts from finance_data.json
+at a concurrency of two requests per worker.
+
+- RSS counts every resident page, including the shared memory-mapped weights.
+- USS counts only pages private to that worker, i.e. the memory each extra
+  worker really adds.
+
+Usage (from the repository root):
+    python -m benchmarks.serving_benchmark
+    python -m benchmarks.serving_benchmark --workers 1 2 4 8 --requests 64 --profile fast
+    python -m benchmarks.serving_benchmark --budget-s 60   # fixed work per request, no deadline cut-offs
+"""
+import argparse
+import os
+import time
+
+import psutil
+
+from fine_tune import load_pairs
+from serving import DEFAULT_MODEL_NAME, ModelServer
+
+
+def memory_mb(pid):
+    info = psutil.Process(pid).memory_full_info()
+    return info.rss / 2 ** 20, info.uss / 2 ** 20
+
+
+def run(model_name, num_workers, prompts, profile, budget_s=None):
+    cores = os.cpu_count() or 1
+    threads = max(1, cores // num_workers)
+    with ModelServer(model_name, num_workers=num_workers, threads_per_worker=threads) as server:
+        # Warm up every worker so lazily touched pages are resident before measuring
+        for future in [server.submit(prompts[0], profile, budget_s) for _ in range(num_workers)]:
+            future.result()
+
+        start = time.perf_counter()
+        futures = [server.submit(prompt, profile, budget_s) for prompt in prompts]
+        for future in futures:
+            future.result()
+        elapsed = time.perf_counter() - start
+
+        memory = [memory_mb(pid) for pid in server.worker_pids]
+    return {
+        "workers": num_workers,
+        "threads": threads,
+        "throughput": len(prompts) / elapsed,
+        "rss_mb": sum(rss for rss, _ in memory) / len(memory),
+        "uss_mb": sum(uss for _, uss in memory) / len(memory)
+    }
+
+
+def main():
+    cores = os.cpu_count() or 1
+    default_workers = sorted({1, 2, max(1, cores // 2), cores})
+    parser = argparse.ArgumentParser(description="Benchmark the multi-process model server.")
+    parser.add_argument("--model", default=DEFAULT_MODEL_NAME)
+    parser.add_argument("--workers", type=int, nargs="+", default=default_workers)
+    parser.add_argument("--requests", type=int, default=48)
+    parser.add_argument("--profile", default="fast")
+    parser.add_argument("--budget-s", type=float, default=None,
+                        help="Override the profile's time budget, e.g. so every request decodes its full length")
+    args = parser.parse_args()
+
+    questions = [pair["question"] for pair in load_pairs()]
+    prompts = [questions[i % len(questions)] for i in range(args.requests)]
+
+    print(f"{cores} cores, {args.requests} requests per run, profile '{args.profile}'\n")
+    print(f"{'Workers':>7} {'Threads':>7} {'Req/s':>8} {'Scaling':>8} {'RSS MB':>8} {'USS MB':>8}")
+    baseline = None
+    for num_workers in args.workers:
+        row = run(args.model, num_workers, prompts, args.profile, args.budget_s)
+        baseline = baseline or row["throughput"]
+        print(f"{row['workers']:>7} {row['threads']:>7} {row['throughput']:>8.2f} "
+              f"{row['throughput'] / baseline:>7.2f}x {row['rss_mb']:>8.0f} {row['uss_mb']:>8.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""
+Thundering-herd load test for quote coalescing.
+
+Many sessions ask about the same ticker at once. With coalescing, upstream
+calls should stay at one per (data kind, ticker) key no matter how many
+requests arrive together.
+
+Usage (from the repository root):
+    python -m benchmarks.thundering_herd
+    python -m benchmarks.thundering_herd --sessions 200 --latency-ms 300
+    python -m benchmarks.thundering_herd --no-coalesce     # baseline for comparison
+"""
+import argparse
+import tempfile
+import threading
+import time
+from collections import Counter
+
+from market_data import CoalescingProvider, ReplayProvider, synthesize_fixtures
+
+
+class CountingProvider(ReplayProvider):
+    """ReplayProvider that counts upstream calls per key."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.calls = Counter()
+        self._count_lock = threading.Lock()
+
+    def _count(self, key):
+        with self._count_lock:
+            self.calls[key] += 1
+
+    def get_quote(self, ticker):
+        self._count(("quote", ticker.upper()))
+        return super().get_quote(ticker)
+
+    def get_info(self, ticker):
+        self._count(("info", ticker.upper()))
+        return super().get_info(ticker)
+
+    def get_history(self, ticker, period="1y"):
+        self._count(("history", ticker.upper(), period))
+        return super().get_history(ticker, period)
+
+
+def run_herd(provider, tickers, sessions):
+    """Release `sessions` threads at once, each fetching quote, info and history like get_stock_price."""
+    barrier = threading.Barrier(sessions)
+    latencies = []
+    latency_lock = threading.Lock()
+
+    def session(i):
+        ticker = tickers[i % len(tickers)]
+        barrier.wait()
+        start = time.perf_counter()
+        provider.get_quote(ticker)
+        provider.get_info(ticker)
+        provider.get_history(ticker, period="1y")
+        with latency_lock:
+            latencies.append(time.perf_counter() - start)
+
+    threads = [threading.Thread(target=session, args=(i,)) for i in range(sessions)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return time.perf_counter() - start, sorted(latencies)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Thundering-herd load test for quote coalescing.")
+    parser.add_argument("--sessions", type=int, default=100)
+    parser.add_argument("--tickers", nargs="+", default=["TSLA"])
+    parser.add_argument("--latency-ms", type=float, default=200.0)
+    parser.add_argument("--no-coalesce", action="store_true")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as fixture_dir:
+        synthesize_fixtures(args.tickers, fixture_dir)
+        upstream = CountingProvider(fixture_dir, latency_ms=args.latency_ms)
+        provider = upstream if args.no_coalesce else CoalescingProvider(upstream)
+
+        elapsed, latencies = run_herd(provider, args.tickers, args.sessions)
+
+    print(f"{args.sessions} concurrent sessions over {len(args.tickers)} ticker(s), "
+          f"{args.latency_ms:.0f}ms upstream latency, coalescing {'off' if args.no_coalesce else 'on'}")
+    print(f"Wall time: {elapsed:.3f}s   p50: {latencies[len(latencies) // 2]:.3f}s   max: {latencies[-1]:.3f}s")
+    print("\nUpstream calls per key:")
+    for key, count in sorted(upstream.calls.items()):
+        print(f"  {'/'.join(key):<24} {count}")
+    if not args.no_coalesce:
+        print("\nCoalescing counters:")
+        for kind, counters in sorted(provider.stats().items()):
+            print(f"  {kind:<8} calls={counters['calls']:<4} coalesced={counters['coalesced']}")
+        over = {key: count for key, count in upstream.calls.items() if count > 1}
+        if over:
+            print(f"\nFAIL: keys fetched more than once: {over}")
+            raise SystemExit(1)
+        print("\nOK: one upstream call per key.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,405 @@
+"""
+Validate, deduplicate and shard question/answer pairs before fine-tuning.
+
+Usage:
+    python data_prep.py finance_data.json scraped/*.jsonl --out data/clean
+    python fine_tune.py --data data/clean
+
+Input is any mix of JSON arrays and JSONL files. JSONL files are streamed line
+by line. Records go through four stages:
+
+1. Schema validation: each record must be an object with non-empty string
+   "question" and "answer" fields within the length limits.
+2. Exact deduplication on the normalised question (lower-cased, punctuation
+   and extra whitespace removed), remembered as a 64-bit hash.
+3. Near-duplicate removal with MinHash over character 5-grams. Signatures are
+   computed in worker processes and matched with banded LSH. Each candidate is
+   verified against the estimated Jaccard similarity, so the first occurrence
+   of a cluster is kept.
+4. Token lengths of the kept pairs, measured with the fine-tuning tokenizer.
+
+The kept pairs are written as JSONL shards with a manifest, and dropped near
+duplicates are logged next to the question they matched so the threshold can
+be tuned. A report with the counts and token-length distribution is printed and
+saved to the output directory.
+"""
+import argparse
+import glob
+import hashlib
+import json
+import multiprocessing as mp
+import os
+import re
+import time
+from collections import Counter, deque
+
+import numpy as np
+
+DEFAULT_TOKENIZER = "google/flan-t5-base"
+DEFAULT_NUM_PERM = 128
+DEFAULT_BANDS = 16
+DEFAULT_THRESHOLD = 0.8
+DEFAULT_SHARD_SIZE = 100_000
+CHUNK_SIZE = 2000
+SHINGLE_SIZE = 5
+MAX_QUESTION_CHARS = 2000
+MAX_ANSWER_CHARS = 10000
+TOKEN_LIMIT = 512  # fine_tune.py truncates inputs and labels at this length
+LENGTH_BINS = [0, 16, 32, 64, 128, 256, 512, 1024]
+MERSENNE_PRIME = (1 << 31) - 1
+# Kept records indexed per LSH bucket. Templated questions share common
+# shingles and would otherwise pile into a few huge buckets, making each
+# lookup verify thousands of candidates.
+MAX_BUCKET = 64
+
+_NON_WORD = re.compile(r'\W+')
+
+
+def normalize(text):
+    """Lower-case and reduce punctuation and whitespace runs to single spaces."""
+    return _NON_WORD.sub(" ", text.lower()).strip()
+
+
+def question_hash(normalized):
+    """64-bit hash of a normalised question. Collisions are negligible below billions of records."""
+    return int.from_bytes(hashlib.blake2b(normalized.encode("utf-8"), digest_size=8).digest(), "little")
+
+
+def iter_records(paths):
+    """Yield every record from JSON arrays and JSONL files; unparseable JSONL lines yield None."""
+    for path in paths:
+        if path.endswith(".jsonl"):
+            with open(path, encoding="utf-8") as f:
+                for line in f:
+                    if not line.strip():
+                        continue
+                    try:
+                        yield json.loads(line)
+                    except json.JSONDecodeError:
+                        yield None
+        else:
+            with open(path, encoding="utf-8") as f:
+                data = json.load(f)
+            yield from (data if isinstance(data, list) else [data])
+
+
+def validate(record):
+    """Return ((question, answer), None) for a valid record, or (None, reason)."""
+    if record is None:
+        return None, "bad_json"
+    if not isinstance(record, dict):
+        return None, "not_object"
+    if "question" not in record or "answer" not in record:
+        return None, "missing_field"
+    question, answer = record["question"], record["answer"]
+    if not isinstance(question, str) or not isinstance(answer, str):
+        return None, "not_string"
+    question, answer = question.strip(), answer.strip()
+    if not question or not answer:
+        return None, "empty"
+    if len(question) > MAX_QUESTION_CHARS or len(answer) > MAX_ANSWER_CHARS:
+        return None, "too_long"
+    return (question, answer), None
+
+
+def hash_parameters(num_perm, bands, seed=0):
+    """Random coefficients for num_perm universal hashes mod 2^31-1 and the per-band key mixers."""
+    rng = np.random.default_rng(seed)
+    a = rng.integers(1, MERSENNE_PRIME, num_perm, dtype=np.uint64)
+    b = rng.integers(0, MERSENNE_PRIME, num_perm, dtype=np.uint64)
+    mixers = rng.integers(1, 2 ** 63, num_perm // bands, dtype=np.uint64) | np.uint64(1)
+    return a, b, mixers
+
+
+def minhash_signatures(texts, a, b, block=16):
+    """
+    MinHash signatures, shape (len(texts), num_perm), of each text's set of
+    character 5-grams. All shingles of the batch are hashed at once and reduced
+    per text with np.minimum.reduceat.
+    """
+    encoded = [t.encode("utf-8").ljust(SHINGLE_SIZE) for t in texts]
+    lengths = np.fromiter((len(e) for e in encoded), dtype=np.int64, count=len(encoded))
+    buffer = np.frombuffer(b"".join(encoded), dtype=np.uint8)
+
+    # Start offset of every 5-gram that lies inside a single text
+    counts = lengths - SHINGLE_SIZE + 1
+    text_starts = np.cumsum(lengths) - lengths
+    offsets = np.cumsum(counts) - counts
+    positions = np.repeat(text_starts - offsets, counts) + np.arange(counts.sum())
+
+    shingles = np.zeros(len(positions), dtype=np.uint64)
+    for j in range(SHINGLE_SIZE):
+        shingles |= buffer[positions + j].astype(np.uint64) << np.uint64(8 * j)
+    shingles %= np.uint64(MERSENNE_PRIME)
+
+    signatures = np.empty((len(texts), len(a)), dtype=np.uint32)
+    for start in range(0, len(a), block):
+        hashed = (a[start:start + block, None] * shingles[None, :] + b[start:start + block, None]) % np.uint64(MERSENNE_PRIME)
+        signatures[:, start:start + block] = np.minimum.reduceat(hashed, offsets, axis=1).T
+    return signatures
+
+
+def band_keys(signatures, mixers):
+    """Collapse each band of rows into one 64-bit key, shape (n, bands)."""
+    n, num_perm = signatures.shape
+    rows = len(mixers)
+    banded = signatures.reshape(n, num_perm // rows, rows).astype(np.uint64)
+    return (banded * mixers).sum(axis=2)
+
+
+_worker = {}
+
+
+def _init_worker(num_perm, bands, seed, tokenizer_name):
+    _worker["a"], _worker["b"], _worker["mixers"] = hash_parameters(num_perm, bands, seed)
+    if tokenizer_name == "whitespace":
+        _worker["tokenizer"] = None
+    else:
+        from transformers import AutoTokenizer
+        _worker["tokenizer"] = AutoTokenizer.from_pretrained(tokenizer_name)
+
+
+def token_lengths(texts):
+    tokenizer = _worker["tokenizer"]
+    if tokenizer is None:
+        return np.array([len(t.split()) for t in texts], dtype=np.int32)
+    return np.array([len(ids) for ids in tokenizer(texts)["input_ids"]], dtype=np.int32)
+
+
+def _process_chunk(chunk):
+    normalized, questions, answers = chunk
+    signatures = minhash_signatures(normalized, _worker["a"], _worker["b"])
+    return signatures, band_keys(signatures, _worker["mixers"]), token_lengths(questions), token_lengths(answers)
+
+
+class LSHIndex:
+    """
+    Banded LSH over the MinHash signatures of kept records. A record that
+    shares a band with a kept one is a duplicate only if their signatures
+    agree on at least `threshold` of their positions. Each bucket holds at most
+    MAX_BUCKET records; a near duplicate still matches through its other bands.
+    """
+
+    def __init__(self, num_perm, bands, threshold):
+        self.min_agree = int(np.ceil(threshold * num_perm))
+        self.tables = [{} for _ in range(bands)]
+        self.signatures = np.empty((1024, num_perm), dtype=np.uint32)
+        self.size = 0
+
+    def add(self, signature, keys):
+        """Return (kept id, similarity) of a near duplicate, or (None, None) after indexing the record."""
+        candidates = set()
+        for table, key in zip(self.tables, keys):
+            bucket = table.get(key)
+            if bucket:
+                candidates.update(bucket)
+        if candidates:
+            ids = list(candidates)
+            agree = np.count_nonzero(self.signatures[ids] == signature, axis=1)
+            best = agree.argmax()
+            if agree[best] >= self.min_agree:
+                return ids[best], float(agree[best]) / len(signature)
+
+        if self.size == len(self.signatures):
+            self.signatures = np.concatenate([self.signatures, np.empty_like(self.signatures)])
+        record_id = self.size
+        self.signatures[record_id] = signature
+        self.size += 1
+        for table, key in zip(self.tables, keys):
+            bucket = table.setdefault(key, [])
+            if len(bucket) < MAX_BUCKET:
+                bucket.append(record_id)
+        return None, None
+
+
+class ShardWriter:
+    """Writes records as numbered JSONL shards of shard_size lines."""
+
+    def __init__(self, out_dir, shard_size):
+        self.out_dir = out_dir
+        self.shard_size = shard_size
+        self.shards = []
+        self._file = None
+        self._count = 0
+        os.makedirs(out_dir, exist_ok=True)
+        # Clear shards from an earlier run so the directory holds one consistent set
+        for old in glob.glob(os.path.join(out_dir, "shard-*.jsonl")):
+            os.remove(old)
+
+    def write(self, record):
+        if self._file is None or self._count == self.shard_size:
+            self._roll()
+        self._file.write(json.dumps(record, ensure_ascii=False) + "\n")
+        self._count += 1
+        self.shards[-1]["records"] += 1
+
+    def _roll(self):
+        if self._file is not None:
+            self._file.close()
+        name = f"shard-{len(self.shards):05d}.jsonl"
+        self._file = open(os.path.join(self.out_dir, name), "w", encoding="utf-8")
+        self._count = 0
+        self.shards.append({"file": name, "records": 0})
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+        return self.shards
+
+
+def length_distribution(lengths):
+    if len(lengths) == 0:
+        return {}
+    histogram, _ = np.histogram(np.minimum(lengths, LENGTH_BINS[-1]), bins=LENGTH_BINS + [LENGTH_BINS[-1] + 1])
+    labels = [f"{lo}-{hi - 1}" for lo, hi in zip(LENGTH_BINS[:-1], LENGTH_BINS[1:])] + [f"{LENGTH_BINS[-1]}+"]
+    return {
+        "mean": float(lengths.mean()),
+        "p50": float(np.percentile(lengths, 50)),
+        "p90": float(np.percentile(lengths, 90)),
+        "p99": float(np.percentile(lengths, 99)),
+        "max": int(lengths.max()),
+        "over_limit": int((lengths > TOKEN_LIMIT).sum()),
+        "histogram": dict(zip(labels, histogram.tolist()))
+    }
+
+
+def prepare(paths, out_dir, num_perm=DEFAULT_NUM_PERM, bands=DEFAULT_BANDS, threshold=DEFAULT_THRESHOLD,
+            shard_size=DEFAULT_SHARD_SIZE, workers=None, tokenizer=DEFAULT_TOKENIZER, seed=0):
+    """Run the full pipeline over `paths` and write shards, a manifest and a report to out_dir."""
+    if num_perm % bands:
+        raise ValueError(f"num_perm ({num_perm}) must be a multiple of bands ({bands})")
+    workers = workers or os.cpu_count() or 1
+    start = time.perf_counter()
+    invalid = Counter()
+    counts = Counter()
+    seen = set()
+    index = LSHIndex(num_perm, bands, threshold)
+    kept_questions = []
+    question_lengths, answer_lengths = [], []
+    writer = ShardWriter(out_dir, shard_size)
+    near_log = open(os.path.join(out_dir, "near_duplicates.jsonl"), "w", encoding="utf-8")
+
+    def chunks():
+        """Validate and drop exact duplicates in the main process, then batch for the workers."""
+        normalized, questions, answers = [], [], []
+        for record in iter_records(paths):
+            counts["read"] += 1
+            pair, reason = validate(record)
+            if reason:
+                invalid[reason] += 1
+                continue
+            key = normalize(pair[0])
+            key_hash = question_hash(key)
+            if key_hash in seen:
+                counts["exact_duplicates"] += 1
+                continue
+            seen.add(key_hash)
+            normalized.append(key)
+            questions.append(pair[0])
+            answers.append(pair[1])
+            if len(normalized) == CHUNK_SIZE:
+                yield normalized, questions, answers
+                normalized, questions, answers = [], [], []
+        if normalized:
+            yield normalized, questions, answers
+
+    def collect(chunk, pending_result):
+        signatures, keys, q_lengths, a_lengths = pending_result.get()
+        _, questions, answers = chunk
+        keep = np.zeros(len(questions), dtype=bool)
+        for i, row_keys in enumerate(keys.tolist()):
+            match, similarity = index.add(signatures[i], row_keys)
+            if match is None:
+                keep[i] = True
+                kept_questions.append(questions[i])
+                writer.write({"question": questions[i], "answer": answers[i]})
+            else:
+                counts["near_duplicates"] += 1
+                near_log.write(json.dumps({
+                    "question": questions[i],
+                    "matched": kept_questions[match],
+                    "similarity": round(similarity, 3)
+                }, ensure_ascii=False) + "\n")
+        question_lengths.append(q_lengths[keep])
+        answer_lengths.append(a_lengths[keep])
+
+    # Keep a bounded number of chunks in flight, so the records waiting on workers
+    # take bounded memory. The per-record state still grows with the input: a hash
+    # per unique question, and the text and MinHash signature of every kept one.
+    with mp.get_context("spawn").Pool(workers, initializer=_init_worker, initargs=(num_perm, bands, seed, tokenizer)) as pool:
+        pending = deque()
+        for chunk in chunks():
+            pending.append((chunk, pool.apply_async(_process_chunk, (chunk,))))
+            if len(pending) >= 2 * workers:
+                collect(*pending.popleft())
+        while pending:
+            collect(*pending.popleft())
+
+    near_log.close()
+    shards = writer.close()
+    elapsed = time.perf_counter() - start
+    question_lengths = np.concatenate(question_lengths) if question_lengths else np.array([], dtype=np.int32)
+    answer_lengths = np.concatenate(answer_lengths) if answer_lengths else np.array([], dtype=np.int32)
+
+    report = {
+        "read": counts["read"],
+        "invalid": dict(invalid),
+        "exact_duplicates": counts["exact_duplicates"],
+        "near_duplicates": counts["near_duplicates"],
+        "kept": index.size,
+        "elapsed_s": elapsed,
+        "records_per_s": counts["read"] / elapsed if elapsed > 0 else None,
+        "tokenizer": tokenizer,
+        "question_tokens": length_distribution(question_lengths),
+        "answer_tokens": length_distribution(answer_lengths)
+    }
+    manifest = {
+        "sources": list(paths),
+        "shards": shards,
+        "records": index.size,
+        "config": {"num_perm": num_perm, "bands": bands, "threshold": threshold, "shingle_size": SHINGLE_SIZE, "seed": seed},
+        "report": report
+    }
+    with open(os.path.join(out_dir, "manifest.json"), "w") as f:
+        json.dump(manifest, f, indent=2)
+    return report
+
+
+def print_report(report):
+    invalid = sum(report["invalid"].values())
+    print(f"Read {report['read']:,} records in {report['elapsed_s']:.1f}s ({report['records_per_s']:,.0f}/s)")
+    print(f"  invalid:          {invalid:,} {report['invalid'] if invalid else ''}")
+    print(f"  exact duplicates: {report['exact_duplicates']:,}")
+    print(f"  near duplicates:  {report['near_duplicates']:,}")
+    print(f"  kept:             {report['kept']:,}")
+    for field in ["question_tokens", "answer_tokens"]:
+        row = report[field]
+        if not row:
+            continue
+        print(f"\n{field.replace('_', ' ').title()} ({report['tokenizer']}): mean {row['mean']:.1f}, p50 {row['p50']:.0f}, "
+              f"p90 {row['p90']:.0f}, p99 {row['p99']:.0f}, max {row['max']}, over {TOKEN_LIMIT}: {row['over_limit']:,}")
+        for bucket, count in row["histogram"].items():
+            print(f"  {bucket:>9} {count:>10,}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Validate, deduplicate and shard question/answer pairs.")
+    parser.add_argument("inputs", nargs="+", help="JSON arrays or JSONL files of {question, answer} records")
+    parser.add_argument("--out", default="data/clean")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD, help="Jaccard similarity of near duplicates")
+    parser.add_argument("--num-perm", type=int, default=DEFAULT_NUM_PERM)
+    parser.add_argument("--bands", type=int, default=DEFAULT_BANDS)
+    parser.add_argument("--shard-size", type=int, default=DEFAULT_SHARD_SIZE)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--tokenizer", default=DEFAULT_TOKENIZER, help="Tokenizer name, or 'whitespace' for word counts")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    report = prepare(args.inputs, args.out, num_perm=args.num_perm, bands=args.bands, threshold=args.threshold,
+                     shard_size=args.shard_size, workers=args.workers, tokenizer=args.tokenizer, seed=args.seed)
+    print_report(report)
+    print(f"\nShards, manifest.json and near_duplicates.jsonl written to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,311 @@
+import re
+
+import numpy as np
+import pandas as pd
+
+from entities import extract_entities, first, monthly_value
+
+MAX_MONTHS = 600
+PAID_OFF = 0.005  # Balances below half a cent count as paid off
+
+STRATEGIES = ["avalanche", "snowball", "custom"]
+
+
+def strategy_orders(balances, aprs, custom_order=None):
+    """
+    Return {strategy: priority order of debt indices}. Avalanche pays the
+    highest APR first, snowball the smallest balance first, and custom follows
+    the user's order (debts not listed keep avalanche order at the end).
+    """
+    orders = {
+        "avalanche": np.lexsort((balances, -aprs)),
+        "snowball": np.lexsort((-aprs, balances))
+    }
+    if custom_order is not None:
+        listed = [i for i in custom_order if 0 <= i < len(balances)]
+        rest = [i for i in orders["avalanche"] if i not in listed]
+        orders["custom"] = np.array(listed + rest)
+    return orders
+
+
+def simulate_payoff(balances, aprs, minimums, budgets, orders, max_months=MAX_MONTHS, record=None, cancel=None):
+    """
+    Simulate month by month for every (order, budget) pair at once.
+
+    balances, aprs (percent) and minimums have one entry per debt; budgets is a
+    1-D array of monthly budgets and orders an (strategies, debts) array of
+    priority orders. All strategies and budgets advance together as rows of a
+    (scenarios, debts) balance matrix.
+
+    Each month interest accrues, every open debt gets its minimum payment, and
+    whatever is left of the budget pays debts down in priority order, so the
+    minimums of debts already paid off roll over to the next one.
+
+    A scenario is given up as never paid off once its debts accrue at least the
+    whole budget in interest even at the lowest open rate, since from then on
+    the total balance can only grow. Otherwise it runs until it is paid off or
+    max_months pass; a total that grows for a while (a large low-rate balance
+    accruing while the extra goes to a high-rate one) is normal.
+
+    Returns per-scenario arrays shaped (strategies, budgets) plus, for the
+    scenario indices in `record`, the balance history of every debt. If the
+    threading.Event `cancel` is set, the simulation stops early and the result
+    has "cancelled" set.
+    """
+    balances = np.asarray(balances, dtype=np.float64)
+    monthly_rates = np.asarray(aprs, dtype=np.float64) / 100 / 12
+    minimums = np.asarray(minimums, dtype=np.float64)
+    budgets = np.asarray(budgets, dtype=np.float64)
+    orders = np.asarray(orders)
+    num_strategies, num_budgets, num_debts = len(orders), len(budgets), len(balances)
+
+    # Scenario s * num_budgets + b uses order s and budget b. Each scenario's
+    # columns are stored in its own priority order, so the monthly allocation
+    # is a plain cumulative sum with no per-month gather or scatter.
+    scenario_orders = np.repeat(orders, num_budgets, axis=0)
+    scenario_budgets = np.tile(budgets, num_strategies)
+    num_scenarios = len(scenario_budgets)
+
+    total_interest = np.zeros(num_scenarios)
+    work_bal = balances[scenario_orders]
+    work_rates = monthly_rates[scenario_orders]
+    work_mins = minimums[scenario_orders]
+    payoff_month = np.where(work_bal <= PAID_OFF, 0, -1)
+    short_of_minimums = np.zeros(num_scenarios, dtype=bool)
+    interest_exceeds_budget = np.zeros(num_scenarios, dtype=bool)
+    keep_rows = np.zeros(num_scenarios, dtype=bool)
+    if record is not None:
+        record = np.asarray(record)
+        keep_rows[record] = True
+        record_inverse = np.argsort(scenario_orders[record], axis=1)
+        history = [np.take_along_axis(work_bal[record], record_inverse, axis=1)]
+
+    # Working set of scenarios still being simulated. Paid-off scenarios, and
+    # ones whose interest outgrows the budget for good, are written back and
+    # dropped so the arrays shrink as months pass.
+    active = np.arange(num_scenarios)
+    work_budgets, work_payoff = scenario_budgets, payoff_month.copy()
+    work_interest = np.zeros(num_scenarios)
+    work_short = np.zeros(num_scenarios, dtype=bool)
+    work_hopeless = np.zeros(num_scenarios, dtype=bool)
+    work_keep = keep_rows
+    if record is not None:
+        record_rows = np.searchsorted(active, record)
+
+    def write_back(rows):
+        index = active[rows]
+        payoff_month[index] = work_payoff[rows]
+        total_interest[index] = work_interest[rows]
+        short_of_minimums[index] = work_short[rows]
+        interest_exceeds_budget[index] = work_hopeless[rows]
+
+    cancelled = False
+    for month in range(1, max_months + 1):
+        if cancel is not None and cancel.is_set():
+            cancelled = True
+            break
+        open_debts = work_bal > PAID_OFF
+        if not open_debts.any():
+            break
+        # Interest can never fall below the lowest open rate on the whole
+        # balance, and while it is at least the budget the balance cannot shrink
+        lowest_rate = np.where(open_debts, work_rates, np.inf).min(axis=1)
+        work_hopeless |= open_debts.any(axis=1) & (lowest_rate * work_bal.sum(axis=1) >= work_budgets)
+
+        interest = work_bal * work_rates
+        work_bal += interest
+        work_interest += interest.sum(axis=1)
+
+        # Minimum payments, scaled down if the budget cannot cover them
+        minimum_due = np.minimum(work_mins, work_bal) * open_debts
+        due_total = minimum_due.sum(axis=1)
+        short = due_total > work_budgets
+        work_short |= short & open_debts.any(axis=1)
+        scale = np.where(short, work_budgets / np.where(due_total > 0, due_total, 1), 1.0)
+        work_bal -= minimum_due * scale[:, None]
+        extra = np.maximum(work_budgets - due_total, 0.0)
+
+        # Allocate the rest in priority order: each debt gets what is left after
+        # the debts ahead of it, capped at its balance
+        ahead = np.cumsum(work_bal, axis=1) - work_bal
+        work_bal -= np.clip(extra[:, None] - ahead, 0.0, work_bal)
+
+        paid = work_bal <= PAID_OFF
+        work_payoff[paid & (work_payoff < 0)] = month
+        work_bal[paid] = 0.0
+
+        if record is not None:
+            history.append(np.take_along_axis(work_bal[record_rows], record_inverse, axis=1))
+
+        done = paid.all(axis=1) | work_hopeless
+        drop = done & ~work_keep
+        if drop.sum() > len(active) // 4:
+            write_back(np.flatnonzero(drop))
+            rows = np.flatnonzero(~drop)
+            active = active[rows]
+            work_bal, work_rates, work_mins = work_bal[rows], work_rates[rows], work_mins[rows]
+            work_budgets, work_payoff = work_budgets[rows], work_payoff[rows]
+            work_interest, work_short, work_keep = work_interest[rows], work_short[rows], work_keep[rows]
+            work_hopeless = work_hopeless[rows]
+            if record is not None:
+                record_rows = np.searchsorted(active, record)
+        if done.all():
+            break
+
+    write_back(np.arange(len(active)))
+
+    # Back to the caller's debt order
+    inverse = np.argsort(scenario_orders, axis=1)
+    debt_payoff_month = np.take_along_axis(payoff_month, inverse, axis=1)
+    paid_off = (debt_payoff_month >= 0).all(axis=1)
+    months = np.where(paid_off, debt_payoff_month.max(axis=1), -1)
+    shape = (num_strategies, num_budgets)
+    return {
+        "months": months.reshape(shape),
+        "total_interest": np.where(paid_off, total_interest, np.nan).reshape(shape),
+        "paid_off": paid_off.reshape(shape),
+        "short_of_minimums": short_of_minimums.reshape(shape),
+        "interest_exceeds_budget": interest_exceeds_budget.reshape(shape),
+        "debt_payoff_month": debt_payoff_month.reshape(shape + (num_debts,)),
+        "history": np.stack(history, axis=1) if record is not None else None,
+        "cancelled": cancelled
+    }
+
+
+def optimize_debt_payoff(debts, budget, custom_order=None, what_if_budgets=None, start_date=None, cancel=None):
+    """
+    Compare avalanche, snowball and (optionally) a custom ordering for a list of
+    debts ({"name", "balance", "apr", "minimum"}) and a monthly budget.
+
+    what_if_budgets is an optional sequence of alternative budgets simulated in
+    the same pass; their results are returned as a DataFrame. cancel is an
+    optional threading.Event that stops the simulation early.
+    """
+    if not debts:
+        return {"success": False, "message": "You haven't added any debts yet. Add one with 'add debt Visa $5,000 at 22% min $150'."}
+
+    names = [d["name"] for d in debts]
+    balances = np.array([float(d["balance"]) for d in debts])
+    aprs = np.array([float(d["apr"]) for d in debts])
+    minimums = np.array([float(d["minimum"]) for d in debts])
+
+    if budget < minimums.sum():
+        return {
+            "success": False,
+            "message": f"A monthly budget of ${budget:,.2f} doesn't cover your minimum payments of ${minimums.sum():,.2f}."
+        }
+
+    orders = strategy_orders(balances, aprs, custom_order)
+    strategies = [s for s in STRATEGIES if s in orders]
+    extra_budgets = [] if what_if_budgets is None else list(what_if_budgets)
+    budgets = np.array([budget] + extra_budgets, dtype=np.float64)
+    # Record balance histories for each strategy at the main budget (column 0)
+    record = [i * len(budgets) for i in range(len(strategies))]
+    result = simulate_payoff(balances, aprs, minimums, budgets, [orders[s] for s in strategies], record=record, cancel=cancel)
+    if result["cancelled"]:
+        return {"success": False, "cancelled": True, "message": "Payoff simulation cancelled."}
+
+    start = pd.Timestamp(start_date or pd.Timestamp.today()).normalize().replace(day=1)
+    summary = []
+    for i, strategy in enumerate(strategies):
+        months = int(result["months"][i, 0])
+        summary.append({
+            "Strategy": strategy.title(),
+            "Months": months if months >= 0 else None,
+            "Payoff Date": (start + pd.DateOffset(months=months)).strftime("%b %Y") if months >= 0 else "Never",
+            "Total Interest": result["total_interest"][i, 0],
+            "Order": " → ".join(names[j] for j in orders[strategy])
+        })
+    summary = pd.DataFrame(summary)
+
+    histories = {}
+    for i, strategy in enumerate(strategies):
+        months = result["months"][i, 0]
+        length = months + 1 if months >= 0 else result["history"].shape[1]
+        histories[strategy] = pd.DataFrame(
+            result["history"][i, :length],
+            columns=names,
+            index=pd.date_range(start, periods=length, freq="MS")
+        )
+
+    what_if = None
+    if extra_budgets:
+        what_if = pd.DataFrame({"Budget": budgets[1:]})
+        for i, strategy in enumerate(strategies):
+            months = result["months"][i, 1:].astype(float)
+            what_if[f"{strategy.title()} Months"] = np.where(months >= 0, months, np.nan)
+            what_if[f"{strategy.title()} Interest"] = result["total_interest"][i, 1:]
+
+    message = f"With a monthly budget of ${budget:,.2f} for {len(debts)} debt(s) totalling ${balances.sum():,.2f}:\n\n"
+    for _, row in summary.iterrows():
+        if pd.isna(row["Months"]):
+            message += f"• {row['Strategy']}: never paid off within {MAX_MONTHS // 12} years\n"
+        else:
+            message += f"• {row['Strategy']}: debt-free by {row['Payoff Date']} ({row['Months']:.0f} months), total interest ${row['Total Interest']:,.2f}\n"
+    if summary["Total Interest"].notna().any():
+        best = summary.loc[summary["Total Interest"].idxmin()]
+        message += f"\nThe {best['Strategy'].lower()} order ({best['Order']}) costs the least interest."
+    elif result["interest_exceeds_budget"][:, 0].all():
+        message += "\nThis budget doesn't cover the interest your debts accrue each month. Try a larger budget."
+    else:
+        message += f"\nNo order pays your debts off within {MAX_MONTHS // 12} years at this budget. Try a larger budget."
+
+    return {
+        "success": True,
+        "message": message,
+        "summary": summary,
+        "histories": histories,
+        "what_if": what_if
+    }
+
+
+def parse_debt_command(text):
+    """
+    Parse 'add debt Visa $5,000 at 22% min $150'. The name may be several words.
+    Returns a debt dict or None.
+    """
+    match = re.match(r'^add debt\s+(.+)$', text.strip(), re.IGNORECASE)
+    if not match:
+        return None
+    body = match.group(1)
+    entities = extract_entities(body)
+    amounts = [e for e in entities if e.kind in ("money", "contribution")]
+    apr = first(entities, "percent")
+    if len(amounts) < 2 or apr is None:
+        return None
+    name = body[:entities[0].start].strip(" ,")
+    if not name:
+        return None
+    return {
+        "name": name,
+        "balance": amounts[0].value,
+        "apr": apr.value,
+        "minimum": amounts[1].value
+    }
+
+
+def parse_payoff_request(text, debt_names):
+    """
+    Parse a payoff question such as 'how fast can I pay off my debts with $1,200 a month'
+    or '... $1,200 budget, order Car, Visa'. Returns (budget, custom_order) or None.
+    """
+    lowered = text.lower()
+    if not re.search(r'pay ?off|payoff|debt.free|avalanche|snowball', lowered) or "debt" not in lowered:
+        return None
+    entities = extract_entities(text)
+    contribution = first(entities, "contribution")
+    amount = first(entities, "money")
+    if contribution:
+        budget = monthly_value(contribution)
+    elif amount and "budget" in lowered:
+        budget = amount.value
+    else:
+        return None
+
+    custom_order = None
+    order_match = re.search(r'order:?\s+(.+)$', text, re.IGNORECASE)
+    if order_match:
+        lookup = {name.lower(): i for i, name in enumerate(debt_names)}
+        custom_order = [lookup[part.strip().lower()] for part in re.split(r',|\bthen\b', order_match.group(1))
+                        if part.strip().lower() in lookup]
+    return budget, custom_order
@@ -0,0 +1,210 @@
+import re
+import threading
+import time
+from functools import lru_cache
+
+import torch
+from transformers import StoppingCriteria, StoppingCriteriaList
+
+# Named decoding profiles callers can choose from. Each profile carries the
+# generate() arguments and a default wall-time budget in seconds.
+DECODING_PROFILES = {
+    "fast": {
+        "budget_s": 1.0,
+        "generate_kwargs": {
+            "max_new_tokens": 64,
+            "do_sample": False,  # Greedy decoding, cheapest per token
+            "num_beams": 1,
+            "repetition_penalty": 1.2
+        }
+    },
+    "balanced": {
+        "budget_s": 2.5,
+        "generate_kwargs": {
+            "max_new_tokens": 128,
+            "min_new_tokens": 20,
+            "do_sample": True,
+            "top_p": 0.90,
+            "top_k": 50,
+            "temperature": 0.7,
+            "repetition_penalty": 1.2
+        }
+    },
+    "quality": {
+        "budget_s": 6.0,
+        "generate_kwargs": {
+            "max_length": 200,
+            "min_length": 40,
+            "do_sample": True,
+            "top_p": 0.90,
+            "top_k": 50,
+            "temperature": 0.7,
+            "repetition_penalty": 1.2
+        }
+    }
+}
+
+DEFAULT_PROFILE = "balanced"
+
+# Fraction of the budget reserved for finishing the current sentence
+SOFT_DEADLINE_FRACTION = 0.75
+
+_SENTENCE_END = re.compile(r'[.!?](?=\s|$)')
+
+_stats_lock = threading.Lock()
+_stats = {}
+
+
+def get_profile(name):
+    """Return the decoding profile with the given name, or raise ValueError."""
+    if name not in DECODING_PROFILES:
+        raise ValueError(f"Unknown decoding profile '{name}'. Choose from: {', '.join(DECODING_PROFILES)}")
+    return DECODING_PROFILES[name]
+
+
+# Markers SentencePiece and byte-level BPE vocabularies put on tokens that start a new word
+_WORD_START_MARKERS = ("\u2581", "\u0120")
+
+
+@lru_cache(maxsize=4)
+def sentence_end_token_ids(tokenizer):
+    """
+    Collect the ids of vocabulary tokens that end in sentence punctuation, and
+    of tokens that start a new word (or end the sequence).
+    """
+    end_ids = []
+    word_start_ids = []
+    for token_id, token in enumerate(tokenizer.convert_ids_to_tokens(list(range(len(tokenizer))))):
+        if not token:
+            continue
+        if token.rstrip().endswith((".", "!", "?")):
+            end_ids.append(token_id)
+        if token.startswith(_WORD_START_MARKERS):
+            word_start_ids.append(token_id)
+    if tokenizer.eos_token_id is not None:
+        word_start_ids.append(tokenizer.eos_token_id)
+    return torch.tensor(end_ids, dtype=torch.long), torch.tensor(word_start_ids, dtype=torch.long)
+
+
+class DeadlineStoppingCriteria(StoppingCriteria):
+    """
+    Stop generation when a wall-time budget runs out.
+
+    Once the soft deadline passes, decoding stops as soon as a sequence has
+    ended a sentence: a token ending in sentence punctuation followed by one
+    that starts a new word, so the "4." of "4.5%" does not count. The extra
+    word is trimmed off afterwards. At the hard deadline every sequence is stopped.
+
+    Only stops of sequences that had not already ended count as cutting the
+    answer short: an answer that closes with EOS after the soft deadline
+    finished on its own.
+    """
+
+    def __init__(self, tokenizer, budget_s, soft_fraction=SOFT_DEADLINE_FRACTION):
+        self.start = time.perf_counter()
+        self.deadline = self.start + budget_s
+        self.soft_deadline = self.start + budget_s * soft_fraction
+        self.sentence_ids, self.word_start_ids = sentence_end_token_ids(tokenizer)
+        # A sequence ending in EOS (or padding after it) finished by itself
+        self.end_ids = torch.tensor([t for t in (tokenizer.eos_token_id, tokenizer.pad_token_id) if t is not None],
+                                    dtype=torch.long)
+        self.hit_soft_deadline = False
+        self.hit_hard_deadline = False
+
+    def __call__(self, input_ids, scores, **kwargs):
+        now = time.perf_counter()
+        batch_size = input_ids.shape[0]
+        if now < self.soft_deadline:
+            return torch.zeros(batch_size, dtype=torch.bool, device=input_ids.device)
+        ended = torch.isin(input_ids[:, -1], self.end_ids.to(input_ids.device))
+        if now >= self.deadline:
+            if not ended.all():
+                self.hit_hard_deadline = True
+            return torch.ones(batch_size, dtype=torch.bool, device=input_ids.device)
+        if input_ids.shape[1] >= 2:
+            done = (torch.isin(input_ids[:, -2], self.sentence_ids.to(input_ids.device))
+                    & torch.isin(input_ids[:, -1], self.word_start_ids.to(input_ids.device)))
+            if (done & ~ended).any():
+                self.hit_soft_deadline = True
+            return done
+        return torch.zeros(batch_size, dtype=torch.bool, device=input_ids.device)
+
+    @property
+    def cut_short(self):
+        return self.hit_soft_deadline or self.hit_hard_deadline
+
+
+def trim_to_sentence(text):
+    """Drop a trailing partial sentence, keeping the text if no boundary exists."""
+    last_end = None
+    for match in _SENTENCE_END.finditer(text):
+        last_end = match.end()
+    if last_end is None:
+        return text
+    return text[:last_end]
+
+
+def record_generation(profile, cut_short, elapsed):
+    """Update the per-profile deadline counters."""
+    with _stats_lock:
+        entry = _stats.setdefault(profile, {"requests": 0, "deadline_stops": 0, "total_seconds": 0.0})
+        entry["requests"] += 1
+        entry["total_seconds"] += elapsed
+        if cut_short:
+            entry["deadline_stops"] += 1
+
+
+def get_deadline_stats():
+    """
+    Return a snapshot of how often each profile was cut short by its deadline.
+    """
+    with _stats_lock:
+        snapshot = {}
+        for profile, entry in _stats.items():
+            requests = entry["requests"]
+            snapshot[profile] = {
+                "requests": requests,
+                "deadline_stops": entry["deadline_stops"],
+                "deadline_stop_rate": entry["deadline_stops"] / requests if requests else 0.0,
+                "avg_seconds": entry["total_seconds"] / requests if requests else 0.0
+            }
+        return snapshot
+
+
+def reset_deadline_stats():
+    with _stats_lock:
+        _stats.clear()
+
+
+def generate_with_budget(model, tokenizer, inputs, profile=DEFAULT_PROFILE, budget_s=None):
+    """
+    Run model.generate with the given decoding profile under a latency budget.
+
+    Returns the decoded text and a dict describing how decoding ended.
+    """
+    settings = get_profile(profile)
+    if budget_s is None:
+        budget_s = settings["budget_s"]
+
+    criteria = DeadlineStoppingCriteria(tokenizer, budget_s)
+    with torch.no_grad():
+        output = model.generate(
+            **inputs,
+            stopping_criteria=StoppingCriteriaList([criteria]),
+            **settings["generate_kwargs"]
+        )
+    elapsed = time.perf_counter() - criteria.start
+
+    text = tokenizer.decode(output[0], skip_special_tokens=True)
+    if criteria.cut_short:
+        # A hard stop can land mid-sentence and a soft stop includes the first
+        # token of the next sentence, so fall back to the last boundary
+        text = trim_to_sentence(text)
+
+    record_generation(profile, criteria.cut_short, elapsed)
+    return text, {
+        "profile": profile,
+        "budget_s": budget_s,
+        "elapsed_s": elapsed,
+        "cut_short": criteria.cut_short
+    }
@@ -0,0 +1,153 @@
+"""
+Distil flan-t5-base into a flan-t5-small student and compare the tiers.
+
+Usage:
+    python distill.py                 # train the student, then evaluate
+    python distill.py --eval-only     # evaluate an existing student
+
+The student is trained on the teacher's answers to the training questions, so
+it learns the teacher's phrasing rather than only the hand-written answers. A
+held-out split is kept aside to report latency and quality per tier.
+"""
+import argparse
+import json
+import os
+import random
+import re
+import statistics
+import time
+from collections import Counter
+
+import torch
+
+from fine_tune import load_pairs, train_model
+from model import FinancialAssistant
+from router import BASE_MODEL_NAME, SMALL_MODEL_PATH, choose_tier
+
+STUDENT_BASE_MODEL = "google/flan-t5-small"
+
+
+def split_pairs(pairs, holdout_fraction=0.2, seed=42):
+    """Shuffle pairs deterministically and split off a held-out set."""
+    shuffled = list(pairs)
+    random.Random(seed).shuffle(shuffled)
+    holdout_size = max(1, int(len(shuffled) * holdout_fraction))
+    return shuffled[holdout_size:], shuffled[:holdout_size]
+
+
+def teacher_answers(teacher, questions, batch_size=8, max_new_tokens=128):
+    """Generate deterministic teacher answers for a list of questions."""
+    answers = []
+    for i in range(0, len(questions), batch_size):
+        batch = questions[i:i + batch_size]
+        inputs = teacher.tokenizer(batch, return_tensors="pt", padding=True, truncation=True, max_length=512)
+        with torch.no_grad():
+            output = teacher.model.generate(**inputs, max_new_tokens=max_new_tokens, num_beams=4, early_stopping=True)
+        answers.extend(teacher.tokenizer.batch_decode(output, skip_special_tokens=True))
+    return answers
+
+
+def build_distillation_set(teacher, train_pairs, keep_gold=True):
+    """
+    Pair each training question with the teacher's answer. With keep_gold the
+    original hand-written answers are kept as extra examples.
+    """
+    questions = [pair["question"] for pair in train_pairs]
+    distilled = [{"question": q, "answer": a} for q, a in zip(questions, teacher_answers(teacher, questions)) if a.strip()]
+    if keep_gold:
+        distilled.extend(train_pairs)
+    return distilled
+
+
+def token_f1(prediction, reference):
+    """Token-overlap F1 between a prediction and a reference answer."""
+    pred_tokens = re.findall(r'\w+', prediction.lower())
+    ref_tokens = re.findall(r'\w+', reference.lower())
+    if not pred_tokens or not ref_tokens:
+        return 0.0
+    common = sum((Counter(pred_tokens) & Counter(ref_tokens)).values())
+    if common == 0:
+        return 0.0
+    precision = common / len(pred_tokens)
+    recall = common / len(ref_tokens)
+    return 2 * precision * recall / (precision + recall)
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def evaluate_tier(answer_fn, pairs):
+    """Time answer_fn over the held-out pairs and score it against the references."""
+    latencies = []
+    scores = []
+    for pair in pairs:
+        start = time.perf_counter()
+        prediction = answer_fn(pair["question"])
+        latencies.append(time.perf_counter() - start)
+        scores.append(token_f1(prediction, pair["answer"]))
+    return {
+        "examples": len(pairs),
+        "mean_latency_s": statistics.mean(latencies),
+        "p95_latency_s": percentile(latencies, 95),
+        "mean_f1": statistics.mean(scores)
+    }
+
+
+def evaluate_tiers(small, base, holdout):
+    """Report latency and quality for the small tier, the base tier and the router."""
+    tiers = {"small": small, "base": base}
+
+    def routed(question):
+        return tiers[choose_tier(question)].generate_response(question, profile="fast")
+
+    report = {
+        "small": evaluate_tier(lambda q: small.generate_response(q, profile="fast"), holdout),
+        "base": evaluate_tier(lambda q: base.generate_response(q, profile="fast"), holdout),
+        "routed": evaluate_tier(routed, holdout)
+    }
+    report["routed"]["small_share"] = sum(choose_tier(pair["question"]) == "small" for pair in holdout) / len(holdout)
+    return report
+
+
+def print_report(report):
+    print(f"\n{'Tier':<8} {'N':>4} {'Mean (s)':>10} {'p95 (s)':>10} {'Token F1':>10}")
+    for tier, row in report.items():
+        print(f"{tier:<8} {row['examples']:>4} {row['mean_latency_s']:>10.3f} {row['p95_latency_s']:>10.3f} {row['mean_f1']:>10.3f}")
+    print(f"\nRouter sent {report['routed']['small_share']:.0%} of held-out questions to the small tier.")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Distil flan-t5-base into a flan-t5-small student.")
+    parser.add_argument("--data", default="finance_data.json")
+    parser.add_argument("--output-dir", default=SMALL_MODEL_PATH)
+    parser.add_argument("--epochs", type=int, default=5)
+    parser.add_argument("--holdout", type=float, default=0.2)
+    parser.add_argument("--no-gold", action="store_true", help="Train on teacher answers only")
+    parser.add_argument("--eval-only", action="store_true")
+    parser.add_argument("--report", default="logs/distill_report.json")
+    args = parser.parse_args()
+
+    train_pairs, holdout = split_pairs(load_pairs(args.data), args.holdout)
+    teacher = FinancialAssistant(BASE_MODEL_NAME)
+
+    if not args.eval_only:
+        distilled = build_distillation_set(teacher, train_pairs, keep_gold=not args.no_gold)
+        print(f"Training student on {len(distilled)} examples ({len(holdout)} held out)...")
+        train_model(distilled, model_name=STUDENT_BASE_MODEL, output_dir=args.output_dir, num_train_epochs=args.epochs)
+
+    student = FinancialAssistant(args.output_dir)
+    report = evaluate_tiers(student, teacher, holdout)
+    print_report(report)
+
+    if args.report:
+        os.makedirs(os.path.dirname(args.report) or ".", exist_ok=True)
+        with open(args.report, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Report written to {args.report}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,866 @@
+"""
+The assistant engine behind the chat: intent routing, calculators, market
+data and chart building, with no Streamlit dependency.
+
+ask_question returns the response text together with the figures to show,
+the intent that answered and per-stage timings, so the same engine serves
+the Streamlit app, trace replay and benchmarks.
+"""
+import random
+import re
+import time
+from contextlib import contextmanager
+
+import numpy as np
+import pandas as pd
+import plotly.graph_objects as go
+from plotly.subplots import make_subplots
+
+from debt import optimize_debt_payoff, parse_debt_command, parse_payoff_request
+from entities import extract_entities, first, summarize
+from indicators import INDICATORS, indicator_cache, parse_overlay_request
+from market_data import get_provider
+from portfolio import analyze_portfolio, parse_holding_command
+from universe import METRIC_COLUMNS, describe_screen, parse_screen_request, price_universe, screen, universe_from_env
+
+FINANCIAL_RESPONSES = {
+    "investment_advice": [
+        "Based on your financial situation, I recommend considering a diversified portfolio that matches your risk tolerance and investment timeline. This might include a mix of stocks, bonds, and other assets.",
+        "Investment decisions should be based on your financial goals, risk tolerance, and time horizon. Consider consulting with a financial advisor for personalized advice.",
+        "When investing, it's important to diversify your portfolio across different asset classes and sectors to manage risk effectively."
+    ],
+    "stock_advice": [
+        "Individual stock selections should be based on thorough research including the company's financials, growth prospects, competitive position, and overall market conditions.",
+        "When considering individual stocks, look at factors like P/E ratio, earnings growth, debt levels, competitive advantages, and industry trends.",
+        "Rather than focusing on individual stocks, many financial advisors recommend index funds for most investors as they provide diversification and typically have lower fees."
+    ],
+    "savings": [
+        "A common financial guideline is to save 15-20% of your income for long-term goals like retirement, while maintaining an emergency fund of 3-6 months of expenses.",
+        "Consider following the 50/30/20 rule: 50% of income for needs, 30% for wants, and 20% for savings and debt repayment.",
+        "Building an emergency fund should be a priority before making significant investments in the market."
+    ]
+}
+
+def get_stock_price(ticker):
+    """
+    Fetch the latest stock price from the configured market-data provider.
+    """
+    try:
+        provider = get_provider()
+        price = provider.get_quote(ticker)
+        if price is None:
+            return {
+                "success": False,
+                "message": f"Could not find data for ticker symbol {ticker}."
+            }
+        
+        # Get additional information
+        info = provider.get_info(ticker)
+        company_name = info.get('shortName', ticker.upper())
+        
+        # Get historical data for chart
+        hist_data = provider.get_history(ticker, period="1y")
+        
+        return {
+            "success": True,
+            "message": f"The latest price of {company_name} ({ticker.upper()}) is ${price:.2f}",
+            "price": price,
+            "name": company_name,
+            "ticker": ticker.upper(),
+            "history": hist_data
+        }
+    except Exception as e:
+        return {
+            "success": False,
+            "message": f"Error fetching data for {ticker}: {str(e)}"
+        }
+
+def get_predefined_response(category):
+    """Return a random predefined response from the specified category."""
+    if category in FINANCIAL_RESPONSES:
+        return random.choice(FINANCIAL_RESPONSES[category])
+    return None
+
+def is_investment_advice_question(question):
+    """Check if the question is asking for investment advice."""
+    investment_patterns = [
+        r'(should|could|would) (i|me) (buy|sell|invest)',
+        r'(is it|would it be) (worth|good|advisable) (to buy|to invest|investing)',
+        r'(what|which) (stocks|investments|etfs|funds) (should|could|would) (i|me)',
+        r'(recommend|suggestion|advice) (for|on) (investing|stocks|funds)'
+    ]
+    
+    for pattern in investment_patterns:
+        if re.search(pattern, question.lower()):
+            return True
+    return False
+
+def extract_ticker_from_question(question):
+    """Extract a potential stock ticker from a question."""
+    # Check for stock prices
+    stock_pattern = re.compile(r'(?:price|value|quote|stock) (?:of|for) ([A-Za-z]+)')
+    ticker_match = stock_pattern.search(question.lower())
+    
+    # Check for direct stock commands
+    direct_stock_pattern = re.compile(r'get stock ([A-Za-z]+)')
+    direct_match = direct_stock_pattern.search(question.lower())
+    
+    # Check for chart requests like "show TSLA with 50-day SMA". The ticker must be
+    # written in capitals so "show me the price chart" does not look up "THE"
+    show_pattern = re.compile(r'(?:show|chart|plot) (?:me )?([A-Za-z]{1,5})\b(?: stock| chart| price| with)', re.IGNORECASE)
+    show_match = next((m for m in show_pattern.finditer(question) if m.group(1).isupper()), None)
+    
+    # Check for buy/sell mentions
+    trade_pattern = re.compile(r'(buy|sell|invest in) ([A-Za-z]+)')
+    trade_match = trade_pattern.search(question.lower())
+    
+    if ticker_match:
+        return ticker_match.group(1).upper()
+    elif direct_match:
+        return direct_match.group(1).upper()
+    elif show_match:
+        return show_match.group(1).upper()
+    elif trade_match:
+        return trade_match.group(2).upper()
+    return None
+
+def extract_loan_details(question):
+    """Extract loan amount, interest rate, and term from a question."""
+    details = summarize(question)
+    
+    # Extract monthly payment inquiry
+    payment_inquiry = "payment" in question.lower() or "pay" in question.lower() or "repay" in question.lower()
+    
+    return {
+        "amount": details["amount"],
+        "rate": details["rate"],
+        "term_months": details["term_months"],
+        "payment_inquiry": payment_inquiry
+    }
+
+def first_amount(text):
+    """Return the first dollar amount in a stored value such as "$5,000 per month"."""
+    entities = extract_entities(text)
+    amount = first(entities, "money") or first(entities, "contribution")
+    return amount.value if amount else None
+
+def format_term(months):
+    """'30 years', '1 year' or '18 months'."""
+    if months % 12 == 0:
+        years = months // 12
+        return f"{years} year" if years == 1 else f"{years} years"
+    return f"{months} month" if months == 1 else f"{months} months"
+
+def calculate_loan_payment(principal, annual_rate, years=None, months=None):
+    """
+    Calculate monthly payment for a loan.
+    
+    Parameters:
+    principal (float): Loan amount
+    annual_rate (float): Annual interest rate in percentage
+    years (int, optional): Loan term in years
+    months (int, optional): Loan term in months
+    
+    Returns:
+    float: Monthly payment amount
+    """
+    if years is not None:
+        months = years * 12
+    elif months is None:
+        # Default to 30 years if no term specified
+        months = 30 * 12
+    
+    # Convert annual rate to monthly rate (and percentage to decimal)
+    monthly_rate = annual_rate / 100 / 12
+    
+    # Calculate monthly payment using the loan formula
+    monthly_payment = principal * (monthly_rate * (1 + monthly_rate) ** months) / ((1 + monthly_rate) ** months - 1)
+    
+    return monthly_payment
+
+def calculate_investment_growth(principal, annual_rate, years=None, monthly_contribution=0, months=None):
+    """
+    Calculate investment growth with compound interest over `years` or `months`
+    (default 30 years).
+    """
+    monthly_rate = annual_rate / 100 / 12
+    if years is not None:
+        total_months = years * 12
+    elif months is not None:
+        total_months = months
+    else:
+        total_months = 30 * 12
+    
+    # Formula for future value with regular contributions
+    if monthly_contribution > 0:
+        future_value = principal * (1 + monthly_rate) ** total_months + \
+                        monthly_contribution * ((1 + monthly_rate) ** total_months - 1) / monthly_rate
+    else:
+        future_value = principal * (1 + monthly_rate) ** total_months
+    
+    return future_value
+
+def handle_financial_question(question, user_data, figures):
+    """Handle various types of financial questions with calculations. Charts are appended to figures."""
+    
+    # Check for loan payment questions
+    if any(word in question.lower() for word in ["loan", "borrow", "mortgage", "repay", "payment"]):
+        loan_details = extract_loan_details(question)
+        
+        # If we found loan details and it looks like a payment question
+        if loan_details["amount"] and loan_details["rate"] and loan_details["payment_inquiry"]:
+            principal = loan_details["amount"]
+            rate = loan_details["rate"]
+            term_months = loan_details["term_months"] if loan_details["term_months"] else 30 * 12  # Default to 30 years
+            term_label = format_term(term_months)
+            
+            # Calculate monthly payment
+            monthly_payment = calculate_loan_payment(principal, rate, months=term_months)
+            
+            # Check if income is mentioned
+            income_mentioned = "income" in question.lower() or "salary" in question.lower() or "earn" in question.lower()
+            
+            income = None
+            # Look for income in user data or question
+            if income_mentioned or any("income" in key.lower() for key in user_data.keys()):
+                for key, value in user_data.items():
+                    if "income" in key.lower() or "salary" in key.lower():
+                        try:
+                            # Extract number from value (e.g., "$5,000 per month" -> 5000)
+                            amount = first_amount(value)
+                            # Check if it's annual or monthly
+                            if "year" in value.lower() or "annual" in value.lower():
+                                income = amount / 12
+                            else:
+                                income = amount
+                                
+                            # If income seems very large, assume it's annual and convert to monthly
+                            if income > 50000 and "month" not in value.lower():
+                                income = income / 12
+                                
+                            break
+                        except Exception as e:
+                            print(f"Error parsing income: {e}")
+                            pass
+            
+            # Create response with proper formatting
+            response = f"For a {term_label} loan of ${principal:,.2f} at {rate}% interest rate:\n\n"
+            response += f"• Monthly payment: ${monthly_payment:.2f}\n"
+            response += f"• Total payment over {term_label}: ${monthly_payment * term_months:,.2f}\n"
+            response += f"• Total interest paid: ${(monthly_payment * term_months) - principal:,.2f}\n"
+            
+            if income:
+                debt_ratio = (monthly_payment / income) * 100
+                response += f"\nBased on your monthly income of ${income:,.2f}, "
+                response += f"this loan payment would be {debt_ratio:.1f}% of your income. "
+                
+                if debt_ratio > 36:
+                    response += "This is higher than the recommended 36% debt-to-income ratio, which may make it difficult to qualify for this loan."
+                elif debt_ratio > 28:
+                    response += "This is within the maximum recommended 36% debt-to-income ratio, but higher than the ideal 28% for housing expenses."
+                else:
+                    response += "This is below the recommended 28% of income for housing expenses, which is generally considered affordable."
+            
+            return response
+    
+    # Check for investment growth questions
+    if any(word in question.lower() for word in ["invest", "return", "grow", "compound", "interest"]):
+        # Look for amount, rate, term and contributions in one pass
+        details = summarize(question)
+        
+        # Check if we have enough information
+        if details["amount"] and details["rate"]:
+            principal = details["amount"]
+            rate = details["rate"]
+            term_months = details["term_months"] or 30 * 12  # Default to 30 years
+            
+            # Monthly contribution, normalised from any period ("$6k a year" -> $500/month)
+            monthly_contribution = details["monthly_contribution"] or 0
+            
+            # Calculate future value
+            future_value = calculate_investment_growth(principal, rate, monthly_contribution=monthly_contribution,
+                                                       months=term_months)
+            total_contributions = monthly_contribution * term_months
+            
+            # Create response
+            response = f"If you invest ${principal:,.2f}"
+            if monthly_contribution > 0:
+                response += f" with a monthly contribution of ${monthly_contribution:.2f}"
+            response += f" at {rate}% annual return for {format_term(term_months)}:\n\n"
+            response += f"• Future value: ${future_value:,.2f}\n"
+            response += f"• Total growth: ${future_value - principal - total_contributions:,.2f}\n"
+            
+            if monthly_contribution > 0:
+                response += f"• Total contributions: ${total_contributions:,.2f}\n"
+                response += f"• Initial investment: ${principal:,.2f}\n"
+            
+            # Add a chart: one bar per month for terms under two years, otherwise per year
+            step = 1 if term_months < 24 else 12
+            points = list(range(0, term_months + 1, step))
+            if points[-1] != term_months:
+                points.append(term_months)
+            
+            data = []
+            for month in points:
+                total = calculate_investment_growth(principal, rate, monthly_contribution=monthly_contribution, months=month)
+                data.append({
+                    "Period": month if step == 1 else month / 12,
+                    "Principal": principal,
+                    "Contributions": monthly_contribution * month,
+                    "Growth": total - principal - monthly_contribution * month,
+                    "Total": total
+                })
+            
+            # Create a DataFrame
+            df = pd.DataFrame(data)
+            
+            # Create a Plotly figure
+            fig = go.Figure()
+            fig.add_trace(go.Bar(
+                x=df["Period"],
+                y=df["Principal"],
+                name="Principal",
+                marker_color='blue'
+            ))
+            
+            if monthly_contribution > 0:
+                fig.add_trace(go.Bar(
+                    x=df["Period"],
+                    y=df["Contributions"],
+                    name="Contributions",
+                    marker_color='green'
+                ))
+            
+            fig.add_trace(go.Bar(
+                x=df["Period"],
+                y=df["Growth"],
+                name="Growth",
+                marker_color='orange'
+            ))
+            
+            fig.update_layout(
+                barmode='stack',
+                title="Investment Growth Over Time",
+                xaxis_title="Month" if step == 1 else "Year",
+                yaxis_title="Value ($)",
+                legend_title="Components"
+            )
+            
+            # Display the chart
+            figures.append(("chart", fig))
+            
+            return response
+    
+    # Check for budgeting questions
+    if any(word in question.lower() for word in ["budget", "save", "saving", "expense", "spend"]):
+        if "50" in question and "30" in question and "20" in question:
+            # User is asking about the 50/30/20 rule
+            response = "The 50/30/20 budgeting rule suggests dividing your after-tax income as follows:\n\n"
+            response += "• 50% for needs (housing, food, utilities, transportation, etc.)\n"
+            response += "• 30% for wants (entertainment, dining out, hobbies, etc.)\n"
+            response += "• 20% for savings and debt repayment\n\n"
+            
+            # Check if we have income information
+            income = None
+            for key, value in user_data.items():
+                if "income" in key.lower() or "salary" in key.lower():
+                    try:
+                        income = first_amount(value)
+                        if income:
+                            break
+                    except:
+                        pass
+            
+            if income:
+                response += f"Based on your monthly income of ${income:,.2f}:\n\n"
+                response += f"• Needs (50%): ${income * 0.5:,.2f}\n"
+                response += f"• Wants (30%): ${income * 0.3:,.2f}\n"
+                response += f"• Savings (20%): ${income * 0.2:,.2f}"
+            
+            return response
+    
+    # If no specific calculation matched, return None to use fallback responses
+    return None
+def handle_information_query(question, user_data):
+    """Handle questions about stored user information with improved pattern recognition"""
+    
+    # More comprehensive check for income-related questions
+    income_keywords = ["income", "salary", "earn", "make", "pay", "earning", "wage", "compensation"]
+    question_words = ["what", "how much", "tell me", "show", "display", "reveal"]
+    time_periods = ["month", "year", "annual", "monthly", "weekly", "hourly"]
+    
+    # Check if the question is asking about income/earnings
+    is_income_question = any(word in question.lower() for word in income_keywords) and \
+                        any(word in question.lower() for word in question_words)
+    
+    if is_income_question:
+        # Look for income information in stored data
+        income_data = None
+        income_key = None
+        
+        for key, value in user_data.items():
+            if any(word in key.lower() for word in income_keywords):
+                income_data = value
+                income_key = key
+                break
+        
+        if income_data:
+            # Determine if user wants monthly or annual income
+            is_annual_request = any(period in question.lower() for period in ["year", "annual", "annually"])
+            is_monthly_data = "month" in income_key.lower() or "month" in income_data.lower()
+            
+            try:
+                # Extract the numeric value
+                income_value = float(re.search(r'(\d[\d,]*\.?\d*)', income_data.replace('$', '')).group(1).replace(',', ''))
+                
+                # Convert between monthly and annual as needed
+                if is_annual_request and is_monthly_data:
+                    annual_value = income_value * 12
+                    return f"Based on your monthly {income_key} of {income_data}, you earn ${annual_value:,.2f} per year."
+                elif not is_annual_request and not is_monthly_data and "year" in income_data.lower():
+                    monthly_value = income_value / 12
+                    return f"Based on your annual {income_key} of {income_data}, you earn ${monthly_value:,.2f} per month."
+                elif is_annual_request:
+                    # If it's already annual data or unspecified
+                    return f"Your annual {income_key} is {income_data}."
+                else:
+                    # If it's already monthly data or unspecified
+                    return f"Your {income_key} is {income_data}."
+            except:
+                # If we can't parse the number, just return the raw data
+                return f"Your {income_key} is {income_data}."
+                
+        return "I don't have any income information stored for you yet. You can set it using 'set monthly_income: $X' or through the Financial Data tab."
+    
+    # Check for other stored data queries (housing, savings, etc.)
+    data_types = ["savings", "debt", "mortgage", "investment", "budget", "expense", "house", "home", "property"]
+    for data_type in data_types:
+        if data_type in question.lower() and any(word in question.lower() for word in question_words):
+            for key, value in user_data.items():
+                if data_type in key.lower():
+                    return f"Your {key} is {value}."
+            return f"I don't have any {data_type} information stored for you yet. You can set it using 'set {data_type}: $X' or through the Financial Data tab."
+    
+    return None
+
+def portfolio_figures(result):
+    """Build the positions table, value history and correlation heatmap for a portfolio analysis."""
+    figures = [("table", result["positions"].round(2))]
+    
+    fig = go.Figure()
+    fig.add_trace(go.Scatter(
+        x=result["value_history"].index,
+        y=result["value_history"].values,
+        mode='lines',
+        name='Portfolio Value'
+    ))
+    fig.update_layout(
+        title="Portfolio Value - 1 Year",
+        xaxis_title="Date",
+        yaxis_title="Value ($)",
+        height=400
+    )
+    figures.append(("chart", fig))
+    
+    if len(result["correlation"]) > 1:
+        heatmap = go.Figure(data=go.Heatmap(
+            z=result["correlation"].values,
+            x=result["correlation"].columns,
+            y=result["correlation"].index,
+            zmin=-1,
+            zmax=1,
+            colorscale='RdBu'
+        ))
+        heatmap.update_layout(title="Return Correlation", height=400)
+        figures.append(("chart", heatmap))
+    return figures
+
+def stock_chart(ticker, stock_data, overlays):
+    """
+    Plot the 1-year close with any requested indicators. Moving averages and
+    Bollinger bands share the price axis; RSI, MACD and volatility get their own panes.
+    """
+    history = stock_data["history"]["Close"]
+    lower_panes = [spec for spec in overlays if not INDICATORS[spec[0]][2]]
+    rows = 1 + len(lower_panes)
+    fig = make_subplots(
+        rows=rows,
+        cols=1,
+        shared_xaxes=True,
+        vertical_spacing=0.05,
+        row_heights=[0.6] + [0.4 / len(lower_panes)] * len(lower_panes) if lower_panes else None
+    )
+    fig.add_trace(go.Scatter(
+        x=history.index,
+        y=history.values,
+        mode='lines',
+        name=f'{ticker} Price'
+    ), row=1, col=1)
+    
+    for name, param in overlays:
+        outputs = indicator_cache.compute(ticker, history, name, param)
+        label = name.upper() if param is None else f"{param}-day {name.upper()}"
+        row = 1 if INDICATORS[name][2] else 2 + lower_panes.index((name, param))
+        for output, values in outputs.items():
+            if name == "macd" and output == "histogram":
+                fig.add_trace(go.Bar(x=history.index, y=values, name="MACD Histogram"), row=row, col=1)
+            else:
+                trace_name = label if len(outputs) == 1 else f"{label} {output}"
+                fig.add_trace(go.Scatter(x=history.index, y=values, mode='lines', name=trace_name), row=row, col=1)
+    
+    fig.update_layout(
+        title=f"{stock_data['name']} ({ticker}) - 1 Year Performance",
+        height=400 + 200 * len(lower_panes)
+    )
+    fig.update_yaxes(title_text="Price ($)", row=1, col=1)
+    fig.update_xaxes(title_text="Date", row=rows, col=1)
+    return fig
+
+# Explicit requests to analyse the stored holdings. Other questions that mention
+# a portfolio ("How should I diversify my portfolio?") fall through to advice.
+PORTFOLIO_ANALYSIS_PATTERN = re.compile(
+    r'\b(?:show|analy[sz]e|review|check|evaluate|summari[sz]e|display)\s+(?:me\s+)?my\s+(?:portfolio|holdings|positions)\b'
+    r'|\bhow\s+(?:is|are)\s+my\s+(?:portfolio|holdings|positions|investments)\s+(?:doing|performing)\b'
+    r'|\b(?:value|worth|performance|risk|p&l|returns?)\s+of\s+my\s+(?:portfolio|holdings|positions)\b'
+    r'|\bmy\s+portfolio(?:\'s)?\s+(?:value|worth|performance|risk|volatility|sharpe|drawdown|p&l|returns?)\b'
+    r'|\bportfolio\s+(?:analysis|summary|report)\b',
+    re.IGNORECASE
+)
+
+def handle_portfolio_query(question, holdings, figures, job=None):
+    """Handle adding, removing and analysing portfolio holdings."""
+    holding = parse_holding_command(question)
+    if holding:
+        holdings.append(holding)
+        return f"✅ Added holding: {holding['shares']:g} shares of {holding['ticker']} at ${holding['cost_basis']:,.2f}"
+    
+    remove_match = re.match(r'^(?:remove|delete) holding ([A-Za-z.\-]+)', question.strip(), re.IGNORECASE)
+    if remove_match:
+        ticker = remove_match.group(1).upper()
+        remaining = [h for h in holdings if h["ticker"] != ticker]
+        if len(remaining) == len(holdings):
+            return f"You don't have any holdings in {ticker}."
+        holdings[:] = remaining
+        return f"✅ Removed all holdings in {ticker}."
+    
+    if PORTFOLIO_ANALYSIS_PATTERN.search(question):
+        if job:
+            job.update(progress=0.1, message="Analysing your portfolio...")
+        result = analyze_portfolio(holdings)
+        if result["success"]:
+            if job:
+                job.update(progress=0.8, message="Drawing charts...", partial=result["message"])
+            figures.extend(portfolio_figures(result))
+        return result["message"]
+    
+    return None
+
+def debt_payoff_figures(result):
+    """Build the strategy comparison, a stacked balance chart per strategy and the what-if budget sweep."""
+    figures = [("table", result["summary"].round(2))]
+    
+    for strategy, history in result["histories"].items():
+        fig = go.Figure()
+        for name in history.columns:
+            fig.add_trace(go.Scatter(
+                x=history.index,
+                y=history[name],
+                mode='lines',
+                name=name,
+                stackgroup='balances'
+            ))
+        fig.update_layout(
+            title=f"{strategy.title()} - Remaining Balances",
+            xaxis_title="Month",
+            yaxis_title="Balance ($)",
+            legend_title="Debts",
+            height=400
+        )
+        figures.append(("chart", fig))
+    
+    if result["what_if"] is not None:
+        what_if = result["what_if"]
+        fig = go.Figure()
+        for column in [c for c in what_if.columns if c.endswith("Months")]:
+            fig.add_trace(go.Scatter(
+                x=what_if["Budget"],
+                y=what_if[column],
+                mode='lines',
+                name=column.replace(" Months", "")
+            ))
+        fig.update_layout(
+            title="Months to Debt-Free by Monthly Budget",
+            xaxis_title="Monthly Budget ($)",
+            yaxis_title="Months",
+            height=400
+        )
+        figures.append(("chart", fig))
+    return figures
+
+def handle_debt_query(question, debts, figures, job=None):
+    """Handle adding and removing debts and payoff-plan questions."""
+    new_debt = parse_debt_command(question)
+    if new_debt:
+        if any(d["name"].lower() == new_debt["name"].lower() for d in debts):
+            return f"You already have a debt called {new_debt['name']}. Remove it first with 'remove debt {new_debt['name']}'."
+        debts.append(new_debt)
+        return f"✅ Added debt: {new_debt['name']} - ${new_debt['balance']:,.2f} at {new_debt['apr']}% APR, minimum ${new_debt['minimum']:,.2f}/month"
+    
+    remove_match = re.match(r'^(?:remove|delete) debt (.+)$', question.strip(), re.IGNORECASE)
+    if remove_match:
+        name = remove_match.group(1).strip().lower()
+        remaining = [d for d in debts if d["name"].lower() != name]
+        if len(remaining) == len(debts):
+            return f"You don't have a debt called {remove_match.group(1).strip()}."
+        debts[:] = remaining
+        return f"✅ Removed debt: {remove_match.group(1).strip()}"
+    
+    payoff_request = parse_payoff_request(question, [d["name"] for d in debts])
+    if payoff_request:
+        budget, custom_order = payoff_request
+        minimum_total = sum(d["minimum"] for d in debts)
+        # Sweep alternative budgets in the same simulation for the what-if chart
+        what_if_budgets = np.linspace(max(minimum_total, 1.0), max(budget, minimum_total) * 3, 200)
+        if job:
+            job.update(progress=0.1, message="Simulating payoff plans...")
+        result = optimize_debt_payoff(debts, budget, custom_order=custom_order, what_if_budgets=what_if_budgets,
+                                      cancel=job.cancel_event if job else None)
+        if job:
+            job.check()
+        if result["success"]:
+            if job:
+                job.update(progress=0.8, message="Drawing charts...", partial=result["message"])
+            figures.extend(debt_payoff_figures(result))
+        return result["message"]
+    
+    return None
+
+def screen_figures(result, spec):
+    """Build the screen results table and a bar chart of each ticker's move."""
+    table = result.copy()
+    for column, fmt in METRIC_COLUMNS.values():
+        table[column] = table[column].map(lambda value: fmt.format(value) if pd.notna(value) else "n/a")
+    figures = [("table", table)]
+    
+    fig = go.Figure(go.Bar(
+        x=result["Ticker"],
+        y=result["Change %"],
+        marker_color=np.where(result["Change %"] >= 0, "seagreen", "firebrick")
+    ))
+    fig.update_layout(
+        title=f"Change {describe_screen(dict(spec, filters=[], limit=None)).strip()}",
+        xaxis_title="Ticker",
+        yaxis_title="Change (%)",
+        height=400
+    )
+    figures.append(("chart", fig))
+    return figures
+
+def handle_screen_query(question, session, figures, job=None):
+    """Handle watchlist commands and screening questions over the watchlist, holdings or the whole universe."""
+    # Tickers must be written in capitals, so "watch out for scams" is not a command
+    watch_match = re.match(r'^(?i:watch|add to (?:my )?watchlist)\s+([A-Z][A-Z.\-]{0,5}(?:[\s,]+[A-Z][A-Z.\-]{0,5})*)$',
+                           question.strip())
+    if watch_match:
+        requested = [t for t in dict.fromkeys(t.upper() for t in re.split(r'[\s,]+', watch_match.group(1)))
+                     if t not in session.watchlist]
+        if not requested:
+            return "Those tickers are already on your watchlist."
+        # Only keep tickers with price data, which also loads them into the universe
+        added = price_universe.ensure(requested)
+        unknown = [t for t in requested if t not in added]
+        if not added:
+            return f"I couldn't find price data for {', '.join(unknown)}."
+        session.watchlist.extend(added)
+        response = f"✅ Added {', '.join(added)} to your watchlist ({len(session.watchlist)} tickers)."
+        if unknown:
+            response += f" No price data for {', '.join(unknown)}."
+        return response
+    
+    unwatch_match = re.match(r'^(?:unwatch|remove from (?:my )?watchlist)\s+([A-Za-z.\-]+)$', question.strip(), re.IGNORECASE)
+    if unwatch_match:
+        ticker = unwatch_match.group(1).upper()
+        if ticker not in session.watchlist:
+            return f"{ticker} is not on your watchlist."
+        session.watchlist.remove(ticker)
+        return f"✅ Removed {ticker} from your watchlist."
+    
+    spec = parse_screen_request(question)
+    if not spec:
+        return None
+    if spec["scope"] == "watchlist":
+        tickers, label = session.watchlist, "your watchlist"
+        if not tickers:
+            return "Your watchlist is empty. Add tickers with 'watch AAPL MSFT NVDA'."
+    elif spec["scope"] == "holdings":
+        tickers, label = list(dict.fromkeys(h["ticker"] for h in session.holdings)), "your holdings"
+        if not tickers:
+            return "You don't have any holdings yet. Add one with 'hold AAPL 10 at 150'."
+    else:
+        tickers, label = universe_from_env() + price_universe.tickers(), "the market universe"
+        if not tickers:
+            return "No screening universe is configured. Set UNIVERSE or UNIVERSE_FILE, or screen your watchlist or holdings instead."
+    
+    if job:
+        job.update(progress=0.1, message=f"Loading prices for {len(tickers)} tickers...")
+    available = price_universe.ensure(tickers)
+    if not available:
+        return f"I couldn't load price data for {label}."
+    if job:
+        job.update(progress=0.7, message="Screening...")
+    result = screen(price_universe, available, window=spec["window"], filters=spec["filters"],
+                    sort=spec["sort"], descending=spec["descending"], limit=spec["limit"])
+    
+    criteria = describe_screen(spec)
+    if result.empty:
+        return f"None of the {len(available)} tickers in {label} are {criteria}."
+    lines = [f"- {row['Ticker']}: {row['Change %']:+.2f}% (${row['Price']:,.2f})" for _, row in result.iterrows()]
+    if spec["limit"] and not spec["filters"]:
+        header = f"{criteria[0].upper() + criteria[1:]} in {label}:"
+    else:
+        header = f"{len(result)} of {len(available)} tickers in {label} are {criteria}:"
+    figures.extend(screen_figures(result, spec))
+    return "\n".join([header] + lines)
+
+class Session:
+    """
+    The per-user state the engine reads and updates. st.session_state has the
+    same attributes, so the app passes it directly.
+    """
+
+    def __init__(self, user_data=None, holdings=None, debts=None, watchlist=None):
+        self.user_data = user_data if user_data is not None else {}
+        self.holdings = holdings if holdings is not None else []
+        self.debts = debts if debts is not None else []
+        self.watchlist = watchlist if watchlist is not None else []
+
+    @classmethod
+    def copy_of(cls, state):
+        """A copy of a session (or st.session_state) that can be changed without touching it."""
+        return cls(dict(state.user_data), [dict(h) for h in state.holdings], [dict(d) for d in state.debts],
+                   list(state.watchlist))
+
+    def apply_changes(self, base, target):
+        """
+        Apply what changed in this session since `base`, the copy it started from,
+        to `target`. Keys and items are merged into target's current contents, so
+        changes made to target in the meantime are kept.
+        """
+        for key in base.user_data.keys() - self.user_data.keys():
+            target.user_data.pop(key, None)
+        for key, value in self.user_data.items():
+            if base.user_data.get(key) != value:
+                target.user_data[key] = value
+        for name in ("holdings", "debts", "watchlist"):
+            removed = list(getattr(base, name))
+            added = []
+            for item in getattr(self, name):
+                if item in removed:
+                    removed.remove(item)
+                else:
+                    added.append(item)
+            current = getattr(target, name)
+            for item in removed:
+                if item in current:
+                    current.remove(item)
+            # The watchlist holds each ticker once
+            current.extend(item for item in added if name != "watchlist" or item not in current)
+
+@contextmanager
+def _stage(timings, name, job=None):
+    if job:
+        job.check()
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings[name] = timings.get(name, 0.0) + (time.perf_counter() - start) * 1000
+
+def ask_question(question, session, context="", job=None):
+    """
+    Generate a response based on financial calculations and predefined responses.
+    
+    Returns a dict with the response text, the figures to show as ("chart", plotly
+    figure) or ("table", DataFrame) pairs, the intent that answered and the time
+    spent in each stage in milliseconds.
+    
+    When run as a background job (see jobs.py), progress and partial answers are
+    reported to `job`, and JobCancelled is raised between stages once it is cancelled.
+    """
+    figures = []
+    timings = {}
+    
+    def answer(response, intent):
+        if job:
+            job.check()
+        return {"response": response, "figures": figures, "intent": intent, "timings": timings}
+    
+    # Debt commands come first since "debt" is also a stored-data keyword
+    with _stage(timings, "debt", job):
+        debt_response = handle_debt_query(question, session.debts, figures, job)
+    if debt_response:
+        return answer(debt_response, "debt")
+    # Screens before stored-data lookups and portfolio analysis ("which of my holdings are up 5%")
+    with _stage(timings, "screen", job):
+        screen_response = handle_screen_query(question, session, figures, job)
+    if screen_response:
+        return answer(screen_response, "screen")
+    # Then check if it's an information retrieval question
+    with _stage(timings, "info", job):
+        info_response = handle_information_query(question, session.user_data)
+    if info_response:
+        return answer(info_response, "info")
+    # Check for portfolio commands before ticker detection ("value of my portfolio" is not a ticker)
+    with _stage(timings, "portfolio", job):
+        portfolio_response = handle_portfolio_query(question, session.holdings, figures, job)
+    if portfolio_response:
+        return answer(portfolio_response, "portfolio")
+    # Check for ticker symbols in the question
+    ticker = extract_ticker_from_question(question)
+    
+    # If we found a potential ticker symbol
+    if ticker:
+        overlays = parse_overlay_request(question)
+        
+        # Check if it looks like a request for stock price or a chart
+        if overlays or any(keyword in question.lower() for keyword in ["price", "value", "quote", "worth", "get stock", "show", "chart"]):
+            if job:
+                job.update(progress=0.1, message=f"Fetching data for {ticker}...")
+            with _stage(timings, "market_data", job):
+                stock_data = get_stock_price(ticker)
+            
+            if stock_data["success"]:
+                # Store the stock data for future reference
+                session.user_data[f"stock_{ticker}"] = f"${stock_data['price']:.2f}"
+                
+                # Create a stock chart
+                if "history" in stock_data:
+                    if job:
+                        job.update(progress=0.6, message="Drawing chart...", partial=stock_data["message"])
+                    with _stage(timings, "chart", job):
+                        figures.append(("chart", stock_chart(ticker, stock_data, overlays)))
+            
+            return answer(stock_data["message"], "stock")
+    
+    # Try to handle question with financial calculations
+    with _stage(timings, "calculation", job):
+        calculated_response = handle_financial_question(question, session.user_data, figures)
+    if calculated_response:
+        return answer(calculated_response, "calculation")
+    
+    # Check if the question is asking for investment advice
+    if is_investment_advice_question(question):
+        # For stock-specific advice
+        if ticker:
+            # This is about a specific stock
+            return answer(get_predefined_response("stock_advice") + "\n\nRemember that past performance is not indicative of future results, and all investments carry risk.", "stock_advice")
+        else:
+            # General investment advice
+            return answer(get_predefined_response("investment_advice") + "\n\nIt's important to do your own research or consult with a financial advisor before making investment decisions.", "investment_advice")
+    
+    # For savings-related questions
+    if any(word in question.lower() for word in ["save", "saving", "budget", "spend"]):
+        return answer(get_predefined_response("savings"), "savings")
+    
+    # For questions we can't specifically answer
+    return answer("I need more specific information to answer that question. Could you provide more details about your financial situation or clarify what you'd like to know?", "fallback")
@@ -0,0 +1,113 @@
+"""
+Single-pass extraction of numeric entities from a question.
+
+One regex scans the text once and every number is classified by what is
+attached to it:
+
+- percent:       "4.5%", "7 percent"
+- duration:      "30 years", "30-year", "18 months" (value in months)
+- contribution:  "$500 per month", "contribute $200", "$6k a year"
+- money:         "$250,000", "10k", "$1.2M", or a bare number
+
+Suffixes (k, M, million, ...) only apply to the number they are attached to,
+so the "k" in "bank" never turns $250,000 into 250 million.
+"""
+import re
+from collections import namedtuple
+
+Entity = namedtuple("Entity", ["kind", "value", "start", "end", "text", "currency", "period"])
+
+MULTIPLIERS = {
+    "k": 1e3, "thousand": 1e3,
+    "m": 1e6, "mm": 1e6, "mil": 1e6, "million": 1e6,
+    "b": 1e9, "bn": 1e9, "billion": 1e9
+}
+
+PERIODS_PER_MONTH = {"week": 52 / 12, "month": 1.0, "quarter": 1 / 3, "year": 1 / 12}
+
+_PERIOD_WORDS = {
+    "week": "week", "weekly": "week", "wk": "week",
+    "month": "month", "monthly": "month", "mo": "month",
+    "quarter": "quarter", "quarterly": "quarter",
+    "year": "year", "yearly": "year", "annually": "year", "annual": "year", "yr": "year", "annum": "year"
+}
+
+_ENTITY_PATTERN = re.compile(r'''
+    (?:(?P<verb>contribut\w*|deposit\w*|add(?:ing)?)\s+(?:an?\s+(?:extra\s+|additional\s+)?)?)?
+    (?P<cur>\$)?\s?
+    (?<![\w.,])(?P<num>\d{1,3}(?:,\d{3})+(?:\.\d+)?|\d+(?:\.\d+)?|\.\d+)
+    (?:\s?(?P<suffix>k|mm|m|mil|bn|b|thousand|million|billion)\b)?
+    (?:
+        \s?(?P<pct>%|percent\b|pct\b)
+      | [\s-]?(?P<dur>years?|yrs?|months?|mos?)\b
+    )?
+    (?:\s*(?:(?:per|a|an|each|every|/)\s*(?P<per>week|wk|month|mo|quarter|year|yr|annum)\b|(?P<adverb>weekly|monthly|quarterly|yearly|annually)\b))?
+''', re.IGNORECASE | re.VERBOSE)
+
+
+def extract_entities(text):
+    """Scan text once and return a list of Entity spans in order of appearance."""
+    entities = []
+    for match in _ENTITY_PATTERN.finditer(text):
+        number = float(match.group("num").replace(",", ""))
+        suffix = (match.group("suffix") or "").lower()
+        currency = match.group("cur") is not None
+        if not currency and suffix in ("k", "b") and match.group("num") in ("401", "403", "457"):
+            continue  # Retirement plan names, not amounts
+        if suffix:
+            number *= MULTIPLIERS[suffix]
+        start, end = match.span()
+        span_text = match.group(0).strip()
+
+        if match.group("pct"):
+            entities.append(Entity("percent", number, start, end, span_text, False, None))
+            continue
+
+        duration = (match.group("dur") or "").lower()
+        if duration:
+            months = number * 12 if duration.startswith("y") else number
+            entities.append(Entity("duration", months, start, end, span_text, False, None))
+            continue
+
+        period_word = (match.group("per") or match.group("adverb") or "").lower()
+        if period_word:
+            entities.append(Entity("contribution", number, start, end, span_text, currency, _PERIOD_WORDS[period_word]))
+        elif match.group("verb") and (currency or suffix):
+            # "contribute $200" with no period is read as monthly
+            entities.append(Entity("contribution", number, start, end, span_text, currency, "month"))
+        else:
+            entities.append(Entity("money", number, start, end, span_text, currency, None))
+    return entities
+
+
+def first(entities, kind):
+    """Return the first entity of a kind, preferring ones with a $ sign for money."""
+    candidates = [e for e in entities if e.kind == kind]
+    if kind == "money":
+        marked = [e for e in candidates if e.currency]
+        candidates = marked or candidates
+    return candidates[0] if candidates else None
+
+
+def monthly_value(entity):
+    """Normalise a contribution to a monthly amount."""
+    return entity.value * PERIODS_PER_MONTH[entity.period or "month"]
+
+
+def summarize(text):
+    """
+    Extract the values the calculators need from one scan of the text.
+    Returns amount, rate, term_months and monthly_contribution (None if absent).
+    """
+    entities = extract_entities(text)
+    amount = first(entities, "money")
+    rate = first(entities, "percent")
+    term = first(entities, "duration")
+    contribution = first(entities, "contribution")
+    return {
+        "amount": amount.value if amount else None,
+        "rate": rate.value if rate else None,
+        "term_months": int(round(term.value)) if term else None,
+        "monthly_contribution": monthly_value(contribution) if contribution else None,
+        "entities": entities
+    }
@@ -1,52 +1,94 @@
+import argparse
 import json
+import os
 import torch
 from transformers import AutoModelForSeq2SeqLM, AutoTokenizer, Trainer, TrainingArguments, DataCollatorForSeq2Seq
-from datasets import Dataset
+from datasets import Dataset, load_dataset
 
-# Load Dataset
-with open("finance_data.json", "r") as f:
-    data = json.load(f)
+def shard_files(path):
+    """The JSONL shards listed in the manifest of a data_prep.py output directory."""
+    with open(os.path.join(path, "manifest.json"), "r") as f:
+        manifest = json.load(f)
+    return [os.path.join(path, shard["file"]) for shard in manifest["shards"]]
 
-dataset = Dataset.from_list(data)
+def load_pairs(path="finance_data.json"):
+    """Load question/answer pairs from a JSON file, a JSONL file or a data_prep.py shard directory."""
+    files = shard_files(path) if os.path.isdir(path) else [path]
+    pairs = []
+    for file in files:
+        with open(file, "r") as f:
+            if file.endswith(".jsonl"):
+                pairs.extend(json.loads(line) for line in f if line.strip())
+            else:
+                pairs.extend(json.load(f))
+    return pairs
 
-# Load Tokenizer and Model
-model_name = "google/flan-t5-base"
-tokenizer = AutoTokenizer.from_pretrained(model_name)
-model = AutoModelForSeq2SeqLM.from_pretrained(model_name)
+def load_training_dataset(path):
+    """
+    Build the training Dataset. Shard directories are read through Arrow by
+    datasets.load_dataset rather than into a Python list, so cleaned corpora of
+    millions of pairs stay out of memory.
+    """
+    if os.path.isdir(path):
+        return load_dataset("json", data_files=shard_files(path), split="train")
+    return Dataset.from_list(load_pairs(path))
 
 # Tokenize Data
-def preprocess_data(examples):
-    inputs = tokenizer(examples["question"], padding="max_length", truncation=True, max_length=512)
-    targets = tokenizer(examples["answer"], padding="max_length", truncation=True, max_length=512)
+def preprocess_data(examples, tokenizer):
+    # No padding here: DataCollatorForSeq2Seq pads each batch to its longest
+    # example (and pads labels with -100), so short pairs don't cost 512 tokens
+    inputs = tokenizer(examples["question"], truncation=True, max_length=512)
+    targets = tokenizer(examples["answer"], truncation=True, max_length=512)
     inputs["labels"] = targets["input_ids"]
     return inputs
 
-tokenized_dataset = dataset.map(preprocess_data, batched=True)
-
-# Training Arguments
-training_args = TrainingArguments(
-    output_dir="./models",
-    per_device_train_batch_size=4,
-    num_train_epochs=3,
-    save_steps=500,
-    save_total_limit=2,
-    logging_dir="./logs",
-    logging_steps=100,
-    evaluation_strategy="no"
-)
-
-# Trainer
-trainer = Trainer(
-    model=model,
-    args=training_args,
-    train_dataset=tokenized_dataset,
-    tokenizer=tokenizer,
-    data_collator=DataCollatorForSeq2Seq(tokenizer)
-)
-
-# Train Model
-trainer.train()
-
-# Save Fine-Tuned Model
-model.save_pretrained("./models")
-tokenizer.save_pretrained("./models")
+def train_model(data, model_name="google/flan-t5-base", output_dir="./models", num_train_epochs=3):
+    """
+    Fine-tune a seq2seq model on {"question", "answer"} pairs (a list or a Dataset) and save it to output_dir.
+    """
+    dataset = data if isinstance(data, Dataset) else Dataset.from_list(data)
+
+    # Load Tokenizer and Model
+    tokenizer = AutoTokenizer.from_pretrained(model_name)
+    model = AutoModelForSeq2SeqLM.from_pretrained(model_name)
+
+    tokenized_dataset = dataset.map(lambda examples: preprocess_data(examples, tokenizer), batched=True,
+                                    remove_columns=dataset.column_names)
+
+    # Training Arguments
+    training_args = TrainingArguments(
+        output_dir=output_dir,
+        per_device_train_batch_size=4,
+        num_train_epochs=num_train_epochs,
+        save_steps=500,
+        save_total_limit=2,
+        logging_dir="./logs",
+        logging_steps=100,
+        evaluation_strategy="no"
+    )
+
+    # Trainer
+    trainer = Trainer(
+        model=model,
+        args=training_args,
+        train_dataset=tokenized_dataset,
+        tokenizer=tokenizer,
+        data_collator=DataCollatorForSeq2Seq(tokenizer, model=model)
+    )
+
+    # Train Model
+    trainer.train()
+
+    # Save Fine-Tuned Model
+    model.save_pretrained(output_dir)
+    tokenizer.save_pretrained(output_dir)
+    return model, tokenizer
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fine-tune a model on question/answer pairs.")
+    parser.add_argument("--data", default="finance_data.json", help="JSON or JSONL file, or a data_prep.py output directory")
+    parser.add_argument("--model", default="google/flan-t5-base")
+    parser.add_argument("--output-dir", default="./models")
+    parser.add_argument("--epochs", type=int, default=3)
+    args = parser.parse_args()
+    train_model(load_training_dataset(args.data), model_name=args.model, output_dir=args.output_dir, num_train_epochs=args.epochs)
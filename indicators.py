@@ -0,0 +1,347 @@
+import math
+import re
+import threading
+from collections import deque
+
+import numpy as np
+
+TRADING_DAYS = 252
+
+
+def ema_series(values, alpha):
+    """
+    Exponential moving average with y[0] = x[0] and y[t] = y[t-1] + alpha * (x[t] - y[t-1]).
+
+    Uses the closed form y[t] = d^t * (y[0] + alpha * sum(x[k] / d^k)) with d = 1 - alpha,
+    evaluated in blocks short enough that d^-k cannot overflow.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    out = np.empty_like(values)
+    if len(values) == 0:
+        return out
+    decay = 1.0 - alpha
+    if decay <= 0:
+        out[:] = values
+        return out
+
+    block = max(1, int(600 / -math.log(decay)))
+    prev = values[0]
+    start = 0
+    first = True
+    while start < len(values):
+        chunk = values[start:start + block]
+        k = np.arange(1, len(chunk) + 1)
+        if first:
+            # The first output is the seed itself
+            k = k - 1
+            chunk = chunk.copy()
+            chunk[0] = 0.0
+        powers = decay ** k
+        out[start:start + len(chunk)] = powers * (prev + alpha * np.cumsum(chunk / powers))
+        prev = out[start + len(chunk) - 1]
+        start += len(chunk)
+        first = False
+    return out
+
+
+def rolling_sum(values, window):
+    """Sum over a trailing window; NaN until the window is full."""
+    values = np.asarray(values, dtype=np.float64)
+    out = np.full(len(values), np.nan)
+    if len(values) >= window:
+        csum = np.cumsum(np.insert(values, 0, 0.0))
+        out[window - 1:] = csum[window:] - csum[:-window]
+    return out
+
+
+class SMA:
+    """Simple moving average over the last `window` closes."""
+
+    def __init__(self, window=50):
+        self.window = window
+        self.buffer = deque(maxlen=window)
+        self.total = 0.0
+
+    def fit(self, closes):
+        closes = np.asarray(closes, dtype=np.float64)
+        self.buffer = deque(closes[-self.window:], maxlen=self.window)
+        self.total = float(np.sum(self.buffer))
+        return {"sma": rolling_sum(closes, self.window) / self.window}
+
+    def update(self, close):
+        if len(self.buffer) == self.window:
+            self.total -= self.buffer[0]
+        self.buffer.append(close)
+        self.total += close
+        value = self.total / self.window if len(self.buffer) == self.window else float("nan")
+        return {"sma": value}
+
+
+class EMA:
+    """Exponential moving average with smoothing 2 / (span + 1)."""
+
+    def __init__(self, span=20):
+        self.span = span
+        self.alpha = 2.0 / (span + 1)
+        self.value = None
+
+    def fit(self, closes):
+        series = ema_series(closes, self.alpha)
+        self.value = float(series[-1]) if len(series) else None
+        return {"ema": series}
+
+    def update(self, close):
+        if self.value is None:
+            self.value = close
+        else:
+            self.value += self.alpha * (close - self.value)
+        return {"ema": self.value}
+
+
+class RSI:
+    """Relative strength index with Wilder smoothing."""
+
+    def __init__(self, period=14):
+        self.period = period
+        self.alpha = 1.0 / period
+        self.prev_close = None
+        self.avg_gain = 0.0
+        self.avg_loss = 0.0
+
+    @staticmethod
+    def _rsi(avg_gain, avg_loss):
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return np.where(avg_loss == 0, 100.0, 100.0 - 100.0 / (1.0 + avg_gain / avg_loss))
+
+    def fit(self, closes):
+        closes = np.asarray(closes, dtype=np.float64)
+        out = np.full(len(closes), np.nan)
+        if len(closes) < 2:
+            self.prev_close = float(closes[-1]) if len(closes) else None
+            return {"rsi": out}
+        changes = np.diff(closes)
+        avg_gain = ema_series(np.maximum(changes, 0.0), self.alpha)
+        avg_loss = ema_series(np.maximum(-changes, 0.0), self.alpha)
+        out[1:] = self._rsi(avg_gain, avg_loss)
+        out[:self.period] = np.nan  # Not meaningful until a full period has passed
+        self.prev_close = float(closes[-1])
+        self.avg_gain = float(avg_gain[-1])
+        self.avg_loss = float(avg_loss[-1])
+        return {"rsi": out}
+
+    def update(self, close):
+        if self.prev_close is None:
+            self.prev_close = close
+            return {"rsi": float("nan")}
+        change = close - self.prev_close
+        self.prev_close = close
+        self.avg_gain += self.alpha * (max(change, 0.0) - self.avg_gain)
+        self.avg_loss += self.alpha * (max(-change, 0.0) - self.avg_loss)
+        return {"rsi": float(self._rsi(self.avg_gain, self.avg_loss))}
+
+
+class MACD:
+    """MACD line, signal line and histogram."""
+
+    def __init__(self, fast=12, slow=26, signal=9):
+        self.fast = EMA(fast)
+        self.slow = EMA(slow)
+        self.signal = EMA(signal)
+
+    def fit(self, closes):
+        line = self.fast.fit(closes)["ema"] - self.slow.fit(closes)["ema"]
+        signal = self.signal.fit(line)["ema"]
+        return {"macd": line, "signal": signal, "histogram": line - signal}
+
+    def update(self, close):
+        line = self.fast.update(close)["ema"] - self.slow.update(close)["ema"]
+        signal = self.signal.update(line)["ema"]
+        return {"macd": line, "signal": signal, "histogram": line - signal}
+
+
+class RollingWindowStats:
+    """Running sum and sum of squares over a fixed window."""
+
+    def __init__(self, window):
+        self.window = window
+        self.buffer = deque(maxlen=window)
+        self.total = 0.0
+        self.total_sq = 0.0
+
+    def seed(self, values):
+        self.buffer = deque(values[-self.window:], maxlen=self.window)
+        tail = np.asarray(self.buffer, dtype=np.float64)
+        self.total = float(tail.sum())
+        self.total_sq = float((tail ** 2).sum())
+
+    def push(self, value):
+        if len(self.buffer) == self.window:
+            oldest = self.buffer[0]
+            self.total -= oldest
+            self.total_sq -= oldest ** 2
+        self.buffer.append(value)
+        self.total += value
+        self.total_sq += value ** 2
+
+    def mean_std(self, ddof=0):
+        n = len(self.buffer)
+        if n < self.window or n - ddof <= 0:
+            return float("nan"), float("nan")
+        mean = self.total / n
+        variance = max((self.total_sq - n * mean ** 2) / (n - ddof), 0.0)
+        return mean, math.sqrt(variance)
+
+
+def rolling_mean_std(values, window, ddof=0):
+    n = window
+    total = rolling_sum(values, window)
+    total_sq = rolling_sum(np.asarray(values, dtype=np.float64) ** 2, window)
+    mean = total / n
+    variance = np.maximum((total_sq - n * mean ** 2) / (n - ddof), 0.0)
+    return mean, np.sqrt(variance)
+
+
+class BollingerBands:
+    """Moving average with bands `num_std` standard deviations either side."""
+
+    def __init__(self, window=20, num_std=2.0):
+        self.window = window
+        self.num_std = num_std
+        self.stats = RollingWindowStats(window)
+
+    def fit(self, closes):
+        closes = np.asarray(closes, dtype=np.float64)
+        middle, std = rolling_mean_std(closes, self.window)
+        self.stats.seed(closes)
+        return {"middle": middle, "upper": middle + self.num_std * std, "lower": middle - self.num_std * std}
+
+    def update(self, close):
+        self.stats.push(close)
+        middle, std = self.stats.mean_std()
+        return {"middle": middle, "upper": middle + self.num_std * std, "lower": middle - self.num_std * std}
+
+
+class RollingVolatility:
+    """Annualised standard deviation of daily log returns over a window."""
+
+    def __init__(self, window=20):
+        self.window = window
+        self.stats = RollingWindowStats(window)
+        self.prev_close = None
+
+    def fit(self, closes):
+        closes = np.asarray(closes, dtype=np.float64)
+        out = np.full(len(closes), np.nan)
+        if len(closes) >= 2:
+            log_returns = np.diff(np.log(closes))
+            _, std = rolling_mean_std(log_returns, self.window, ddof=1)
+            out[1:] = std * math.sqrt(TRADING_DAYS)
+            self.stats.seed(log_returns)
+        self.prev_close = float(closes[-1]) if len(closes) else None
+        return {"volatility": out}
+
+    def update(self, close):
+        if self.prev_close is not None:
+            self.stats.push(math.log(close / self.prev_close))
+        self.prev_close = close
+        _, std = self.stats.mean_std(ddof=1)
+        return {"volatility": std * math.sqrt(TRADING_DAYS)}
+
+
+# name -> (class, default parameter, whether it is drawn on the price axis)
+INDICATORS = {
+    "sma": (SMA, 50, True),
+    "ema": (EMA, 20, True),
+    "bollinger": (BollingerBands, 20, True),
+    "rsi": (RSI, 14, False),
+    "macd": (MACD, None, False),
+    "volatility": (RollingVolatility, 20, False)
+}
+
+# An optional "50-day" prefix, then the indicator's names, each a whole word
+_WINDOW_PREFIX = r'(?:\b(\d+)[\s-]*(?:day|d)[\s-]*)?'
+_OVERLAY_PATTERNS = [
+    ("sma", _WINDOW_PREFIX + r'\b(?:sma|simple moving average|moving average|ma)\b'),
+    ("ema", _WINDOW_PREFIX + r'\b(?:ema|exponential moving average)\b'),
+    ("bollinger", _WINDOW_PREFIX + r'\bbollinger(?: bands?)?\b'),
+    ("rsi", _WINDOW_PREFIX + r'\b(?:rsi|relative strength)\b'),
+    ("macd", r'()\bmacd\b'),
+    # "volatility" alone is often just part of the question ("is TSLA's volatility
+    # too high?"), so it needs a window, "rolling", or to be asked for with/and
+    ("volatility", r'(?:\b(\d+)[\s-]*(?:day|d)[\s-]*|\brolling\s+|\b(?:with|and|plus|add)\s+)volatility\b')
+]
+
+
+def parse_overlay_request(question):
+    """
+    Find indicator overlays in a question such as "show TSLA with 50-day SMA and RSI".
+    Returns a list of (name, parameter) tuples in the order they were mentioned.
+    """
+    text = question.lower()
+    found = []
+    for name, pattern in _OVERLAY_PATTERNS:
+        for match in re.finditer(pattern, text):
+            # "exponential moving average" also matches the SMA pattern; let EMA claim it
+            if name == "sma" and text[:match.start()].rstrip().endswith("exponential"):
+                continue
+            param = int(match.group(1)) if match.group(1) else INDICATORS[name][1]
+            found.append((match.start(), name, param))
+    found.sort()
+    specs = []
+    for _, name, param in found:
+        if (name, param) not in specs:
+            specs.append((name, param))
+    return specs
+
+
+def make_indicator(name, param):
+    cls = INDICATORS[name][0]
+    return cls() if param is None else cls(param)
+
+
+class IndicatorCache:
+    """
+    Keeps fitted indicators per (ticker, name, parameter). When the stored
+    history gains new bars, only those bars are fed through update() instead
+    of recomputing the whole window. If bars already seen have changed (an
+    intraday last bar, or adjusted closes), the indicator is refitted.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = {}
+
+    def compute(self, ticker, closes, name, param):
+        """
+        closes is a pandas Series indexed by date. Returns {output: np.ndarray}
+        aligned with closes.
+        """
+        key = (ticker, name, param)
+        with self._lock:
+            entry = self._entries.get(key)
+            pos = closes.index.get_indexer([entry["last_date"]])[0] if entry else -1
+            if pos >= 0:
+                # The bars both calls share must be unchanged, or the state is stale
+                overlap = min(pos + 1, len(entry["closes"]))
+                if not np.array_equal(entry["closes"][-overlap:], closes.values[pos + 1 - overlap:pos + 1], equal_nan=True):
+                    pos = -1
+            if pos >= 0 and entry["length"] >= pos + 1:
+                # Incremental path: feed only the bars after the last one seen.
+                # This also covers a rolling window that dropped its oldest bars.
+                for close in closes.values[pos + 1:]:
+                    for output, value in entry["indicator"].update(float(close)).items():
+                        entry["series"][output].append(value)
+            else:
+                indicator = make_indicator(name, param)
+                outputs = indicator.fit(closes.values)
+                entry = {"indicator": indicator, "series": {k: list(v) for k, v in outputs.items()}}
+                self._entries[key] = entry
+            for output, values in entry["series"].items():
+                del values[:-len(closes)]
+            entry["length"] = len(closes)
+            entry["last_date"] = closes.index[-1]
+            entry["closes"] = closes.values.astype(np.float64)
+            return {output: np.array(values) for output, values in entry["series"].items()}
+
+
+indicator_cache = IndicatorCache()
@@ -0,0 +1,161 @@
+"""
+Background jobs for slow chat handlers.
+
+A JobManager runs jobs on a bounded thread pool so a Streamlit rerun never
+blocks on a fetch or simulation. Each job's function receives the Job and uses
+it to report progress and partial results. Every report is also a cancellation
+point: once the user cancels, the next report raises JobCancelled and the
+worker is free for the next job. Each session may only have a few jobs in
+flight, so one user cannot fill the pool.
+"""
+import itertools
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+DEFAULT_WORKERS = 4
+DEFAULT_MAX_PER_SESSION = 2
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+CANCELLED = "cancelled"
+
+
+class JobCancelled(Exception):
+    """Raised inside a job's function once the job has been cancelled."""
+
+
+class Job:
+    """One unit of background work and the state the UI polls."""
+
+    def __init__(self, job_id, session_id, description=""):
+        self.id = job_id
+        self.session_id = session_id
+        self.description = description
+        self.status = QUEUED
+        self.progress = 0.0
+        self.message = "Waiting for a free worker..."
+        self.partial = None
+        self.result = None
+        self.error = None
+        self.cancel_event = threading.Event()
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self._future = None
+
+    @property
+    def cancelled(self):
+        return self.cancel_event.is_set()
+
+    @property
+    def finished(self):
+        return self.status in (DONE, FAILED, CANCELLED)
+
+    def check(self):
+        """Raise JobCancelled if the job has been cancelled."""
+        if self.cancel_event.is_set():
+            raise JobCancelled()
+
+    def update(self, progress=None, message=None, partial=None):
+        """Report progress (0-1), a status message and/or a partial result. Raises JobCancelled if cancelled."""
+        self.check()
+        if progress is not None:
+            self.progress = progress
+        if message is not None:
+            self.message = message
+        if partial is not None:
+            self.partial = partial
+
+    def cancel(self):
+        """Ask the job to stop. A queued job never starts; a running one stops at its next check."""
+        self.cancel_event.set()
+        if self._future is not None:
+            self._future.cancel()
+
+    def _finish(self, status, error=None):
+        self.status = status
+        self.error = error
+        self.finished_at = time.time()
+
+
+class JobManager:
+    """
+    Bounded pool of worker threads with a per-session cap on jobs in flight.
+    """
+
+    def __init__(self, max_workers=DEFAULT_WORKERS, max_per_session=DEFAULT_MAX_PER_SESSION):
+        self.max_workers = max_workers
+        self.max_per_session = max_per_session
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="job")
+        self._lock = threading.Lock()
+        self._active = {}
+        self._ids = itertools.count(1)
+
+    def submit(self, session_id, fn, *args, description="", **kwargs):
+        """
+        Run fn(job, *args, **kwargs) in the background. Returns {"success": True, "job": job},
+        or success False with a message if the session already has max_per_session jobs in flight.
+        """
+        with self._lock:
+            in_flight = sum(1 for job in self._active.values() if job.session_id == session_id)
+            if in_flight >= self.max_per_session:
+                return {
+                    "success": False,
+                    "message": f"You already have {in_flight} request(s) running. Wait for one to finish or cancel it."
+                }
+            job = Job(next(self._ids), session_id, description)
+            self._active[job.id] = job
+        job._future = self._executor.submit(self._run, job, fn, args, kwargs)
+        job._future.add_done_callback(lambda future: self._release(job, future))
+        return {"success": True, "job": job}
+
+    def _run(self, job, fn, args, kwargs):
+        if job.cancelled:
+            job._finish(CANCELLED)
+            return
+        job.status = RUNNING
+        job.started_at = time.time()
+        job.message = "Working..."
+        try:
+            job.result = fn(job, *args, **kwargs)
+            job.progress = 1.0
+            job._finish(DONE)
+        except JobCancelled:
+            job._finish(CANCELLED)
+        except Exception as e:
+            job._finish(FAILED, f"{type(e).__name__}: {e}")
+
+    def _release(self, job, future):
+        if future.cancelled():
+            job._finish(CANCELLED)
+        with self._lock:
+            self._active.pop(job.id, None)
+
+    def active_jobs(self, session_id=None):
+        with self._lock:
+            return [job for job in self._active.values() if session_id is None or job.session_id == session_id]
+
+    def stats(self):
+        jobs = self.active_jobs()
+        return {
+            "workers": self.max_workers,
+            "running": sum(1 for job in jobs if job.status == RUNNING),
+            "queued": sum(1 for job in jobs if job.status == QUEUED)
+        }
+
+    def shutdown(self):
+        for job in self.active_jobs():
+            job.cancel()
+        self._executor.shutdown(wait=True)
+
+
+def job_manager_from_env():
+    """Build a JobManager sized by JOB_WORKERS and JOB_MAX_PER_SESSION."""
+    return JobManager(
+        max_workers=int(os.environ.get("JOB_WORKERS", DEFAULT_WORKERS)),
+        max_per_session=int(os.environ.get("JOB_MAX_PER_SESSION", DEFAULT_MAX_PER_SESSION))
+    )
@@ -0,0 +1,527 @@
+"""
+Market-data providers for quotes, company info and price history.
+
+The app talks to whichever provider get_provider() returns:
+
+- YFinanceProvider fetches live data from Yahoo Finance.
+- RecordingProvider wraps another provider and saves every response as a fixture.
+- ReplayProvider serves saved fixtures from disk, with optional artificial
+  latency, so the app can run and be profiled without network access.
+
+get_provider() wraps the chosen provider in a CoalescingProvider, so concurrent
+requests for the same ticker and data kind share one upstream fetch, and then
+in a CachingProvider that serves expired entries immediately while refreshing
+them in the background (stale-while-revalidate).
+
+Select one with environment variables:
+    MARKET_DATA_PROVIDER=yfinance|record|replay   (default: yfinance)
+    MARKET_DATA_FIXTURES=fixtures/market_data     (fixture directory)
+    MARKET_DATA_LATENCY_MS=0                      (replay latency per call)
+    QUOTE_TTL_SECONDS=60                          (freshness of cached quotes)
+
+Record fixtures from live data or synthesise offline ones:
+    python market_data.py record AAPL MSFT
+    python market_data.py synthesize AAPL MSFT --days 252
+"""
+import argparse
+import json
+import os
+import random
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+DEFAULT_FIXTURE_DIR = os.path.join("fixtures", "market_data")
+
+# Trading days per yfinance period, used to trim a longer recording
+PERIOD_BARS = {"1d": 1, "5d": 5, "1mo": 21, "3mo": 63, "6mo": 126, "1y": 252, "2y": 504, "5y": 1260}
+
+
+class MarketDataProvider(ABC):
+    """
+    Interface for market data. Unknown tickers return None, {} or an empty
+    DataFrame. A provider missing any method fails when it is constructed.
+    """
+
+    @abstractmethod
+    def get_quote(self, ticker):
+        """Return the latest close price as a float, or None."""
+
+    @abstractmethod
+    def get_info(self, ticker):
+        """Return a dict of company information such as 'shortName'."""
+
+    @abstractmethod
+    def get_history(self, ticker, period="1y"):
+        """Return a daily OHLCV DataFrame indexed by date."""
+
+
+class YFinanceProvider(MarketDataProvider):
+    """Live data from Yahoo Finance via yfinance."""
+
+    def __init__(self):
+        import yfinance as yf
+        self._yf = yf
+
+    def get_quote(self, ticker):
+        history = self.get_history(ticker, period="1d")
+        if history.empty:
+            return None
+        return float(history["Close"].iloc[-1])
+
+    def get_info(self, ticker):
+        return self._yf.Ticker(ticker).info or {}
+
+    def get_history(self, ticker, period="1y"):
+        return self._yf.Ticker(ticker).history(period=period)
+
+
+def _fixture_path(fixture_dir, ticker, name):
+    return os.path.join(fixture_dir, ticker.upper(), name)
+
+
+def _read_history(path):
+    history = pd.read_csv(path, index_col=0)
+    history.index = pd.to_datetime(history.index)
+    history.index.name = "Date"
+    return history
+
+
+def _write_history(path, history):
+    history = history.copy()
+    # Store local wall-clock dates; mixed UTC offsets do not round-trip through CSV
+    if getattr(history.index, "tz", None) is not None:
+        history.index = history.index.tz_localize(None)
+    history.to_csv(path)
+
+
+class RecordingProvider(MarketDataProvider):
+    """Delegates to another provider and saves each response as a fixture."""
+
+    def __init__(self, inner, fixture_dir=DEFAULT_FIXTURE_DIR):
+        self.inner = inner
+        self.fixture_dir = fixture_dir
+
+    def _dir(self, ticker):
+        path = os.path.join(self.fixture_dir, ticker.upper())
+        os.makedirs(path, exist_ok=True)
+        return path
+
+    def get_quote(self, ticker):
+        price = self.inner.get_quote(ticker)
+        if price is not None:
+            with open(os.path.join(self._dir(ticker), "quote.json"), "w") as f:
+                json.dump({"price": price}, f)
+        return price
+
+    def get_info(self, ticker):
+        info = self.inner.get_info(ticker)
+        if info:
+            with open(os.path.join(self._dir(ticker), "info.json"), "w") as f:
+                json.dump(info, f, default=str)
+        return info
+
+    def get_history(self, ticker, period="1y"):
+        history = self.inner.get_history(ticker, period=period)
+        if not history.empty:
+            _write_history(os.path.join(self._dir(ticker), f"history_{period}.csv"), history)
+        return history
+
+
+class ReplayProvider(MarketDataProvider):
+    """
+    Serves recorded fixtures from local files. latency_ms (plus up to
+    jitter_ms of uniform noise) is slept on every call to mimic the network.
+    """
+
+    def __init__(self, fixture_dir=DEFAULT_FIXTURE_DIR, latency_ms=0.0, jitter_ms=0.0, seed=None):
+        self.fixture_dir = fixture_dir
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._histories = {}
+
+    def _sleep(self):
+        delay = self.latency_ms
+        if self.jitter_ms:
+            with self._lock:
+                delay += self._random.uniform(0, self.jitter_ms)
+        if delay > 0:
+            time.sleep(delay / 1000)
+
+    def _load_history(self, ticker, period):
+        key = (ticker.upper(), period)
+        with self._lock:
+            if key in self._histories:
+                return self._histories[key]
+        path = _fixture_path(self.fixture_dir, ticker, f"history_{period}.csv")
+        trim = False
+        if not os.path.exists(path):
+            # Fall back to the 1-year recording and trim it to the period
+            path = _fixture_path(self.fixture_dir, ticker, "history_1y.csv")
+            trim = period in PERIOD_BARS
+        history = _read_history(path) if os.path.exists(path) else pd.DataFrame()
+        if trim and not history.empty:
+            history = history.iloc[-PERIOD_BARS[period]:]
+        with self._lock:
+            self._histories[key] = history
+        return history
+
+    def get_quote(self, ticker):
+        self._sleep()
+        path = _fixture_path(self.fixture_dir, ticker, "quote.json")
+        if os.path.exists(path):
+            with open(path) as f:
+                return json.load(f)["price"]
+        history = self._load_history(ticker, "1d")
+        return None if history.empty else float(history["Close"].iloc[-1])
+
+    def get_info(self, ticker):
+        self._sleep()
+        path = _fixture_path(self.fixture_dir, ticker, "info.json")
+        if not os.path.exists(path):
+            return {}
+        with open(path) as f:
+            return json.load(f)
+
+    def get_history(self, ticker, period="1y"):
+        self._sleep()
+        return self._load_history(ticker, period).copy()
+
+
+class _Flight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """
+    Runs at most one call per key at a time. Callers that arrive while a call
+    for their key is in flight wait for it and receive its result (or error).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._flights = {}
+        self._stats = {}
+
+    def do(self, key, fn):
+        """Return (result, shared) where shared is True if another caller's fetch was reused."""
+        kind = key[0]
+        with self._lock:
+            flight = self._flights.get(key)
+            counters = self._stats.setdefault(kind, {"calls": 0, "coalesced": 0})
+            if flight is not None:
+                counters["coalesced"] += 1
+                leader = False
+            else:
+                flight = _Flight()
+                self._flights[key] = flight
+                counters["calls"] += 1
+                leader = True
+
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.result, True
+
+        try:
+            flight.result = fn()
+        except Exception as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._flights[key]
+            flight.done.set()
+        return flight.result, False
+
+    def stats(self):
+        """Per data kind: upstream calls made and requests collapsed into them."""
+        with self._lock:
+            return {kind: dict(counters) for kind, counters in self._stats.items()}
+
+    def reset_stats(self):
+        with self._lock:
+            self._stats.clear()
+
+
+class CoalescingProvider(MarketDataProvider):
+    """Collapses concurrent identical requests to the wrapped provider into one fetch."""
+
+    def __init__(self, inner):
+        self.inner = inner
+        self.flights = SingleFlight()
+
+    def get_quote(self, ticker):
+        result, _ = self.flights.do(("quote", ticker.upper()), lambda: self.inner.get_quote(ticker))
+        return result
+
+    def get_info(self, ticker):
+        result, shared = self.flights.do(("info", ticker.upper()), lambda: self.inner.get_info(ticker))
+        return dict(result) if shared else result
+
+    def get_history(self, ticker, period="1y"):
+        result, shared = self.flights.do(("history", ticker.upper(), period),
+                                         lambda: self.inner.get_history(ticker, period=period))
+        # Waiters get their own copy so no caller can mutate another's frame
+        return result.copy() if shared else result
+
+    def stats(self):
+        return self.flights.stats()
+
+
+# Seconds each kind of data stays fresh in the CachingProvider
+DEFAULT_TTLS = {"quote": 60, "info": 24 * 60 * 60, "history": 15 * 60}
+# Seconds after which an expired entry is too old to serve while it refreshes;
+# the request blocks on a fresh fetch instead
+DEFAULT_MAX_STALE = {"quote": 15 * 60, "info": 7 * 24 * 60 * 60, "history": 24 * 60 * 60}
+DEFAULT_MAX_ENTRIES = 2000
+
+
+def _copy(value):
+    if isinstance(value, pd.DataFrame):
+        return value.copy()
+    if isinstance(value, dict):
+        return dict(value)
+    return value
+
+
+def _is_empty(value):
+    if value is None:
+        return True
+    if isinstance(value, (pd.DataFrame, dict)):
+        return len(value) == 0
+    return False
+
+
+class CachingProvider(MarketDataProvider):
+    """
+    Caches responses per (kind, ticker[, period]) with stale-while-revalidate:
+    fresh entries are returned directly, expired entries are returned at once
+    while a background refresh runs, and cold keys, or entries older than
+    max_stale, block on the fetch. At most max_entries responses are kept,
+    least recently used first out. It also remembers recently queried tickers
+    that returned data, for the watchlist refresher.
+    """
+
+    def __init__(self, inner, ttls=None, max_stale=None, max_entries=DEFAULT_MAX_ENTRIES, max_workers=4, max_recent=200):
+        self.inner = inner
+        self.ttls = dict(DEFAULT_TTLS, **(ttls or {}))
+        # An entry is never too old to serve before it has even expired
+        self.max_stale = {kind: max(seconds, self.ttls[kind])
+                          for kind, seconds in dict(DEFAULT_MAX_STALE, **(max_stale or {})).items()}
+        self.max_entries = max_entries
+        self.max_recent = max_recent
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._refreshing = set()
+        self._recent = OrderedDict()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="quote-refresh")
+        self._stats = {"hits": 0, "stale_hits": 0, "misses": 0, "expired": 0, "evictions": 0,
+                       "refreshes": 0, "refresh_errors": 0}
+
+    def _fetch(self, key):
+        kind, ticker = key[0], key[1]
+        if kind == "quote":
+            return self.inner.get_quote(ticker)
+        if kind == "info":
+            return self.inner.get_info(ticker)
+        return self.inner.get_history(ticker, period=key[2])
+
+    def _store(self, key, value):
+        if not _is_empty(value):
+            with self._lock:
+                self._entries[key] = (value, time.time())
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+                    self._stats["evictions"] += 1
+
+    def _touch(self, ticker):
+        """Remember a ticker that returned data. Call with the lock held."""
+        self._recent[ticker] = time.time()
+        self._recent.move_to_end(ticker)
+        while len(self._recent) > self.max_recent:
+            self._recent.popitem(last=False)
+
+    def _refresh_in_background(self, key):
+        try:
+            self._store(key, self._fetch(key))
+            with self._lock:
+                self._stats["refreshes"] += 1
+        except Exception as e:
+            # Keep serving the stale value; the next request retries
+            print(f"Background refresh of {key} failed: {e}")
+            with self._lock:
+                self._stats["refresh_errors"] += 1
+        finally:
+            with self._lock:
+                self._refreshing.discard(key)
+
+    def _get(self, key):
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and now - entry[1] >= self.max_stale[key[0]]:
+                # Too old to pass off as current (e.g. after the app sat idle)
+                del self._entries[key]
+                self._stats["expired"] += 1
+                entry = None
+            if entry is not None:
+                value, fetched_at = entry
+                self._entries.move_to_end(key)
+                self._touch(key[1])
+                if now - fetched_at < self.ttls[key[0]]:
+                    self._stats["hits"] += 1
+                else:
+                    self._stats["stale_hits"] += 1
+                    if key not in self._refreshing:
+                        self._refreshing.add(key)
+                        self._executor.submit(self._refresh_in_background, key)
+                return _copy(value)
+            self._stats["misses"] += 1
+
+        value = self._fetch(key)
+        self._store(key, value)
+        if not _is_empty(value):
+            with self._lock:
+                self._touch(key[1])
+        return _copy(value)
+
+    def get_quote(self, ticker):
+        return self._get(("quote", ticker.upper()))
+
+    def get_info(self, ticker):
+        return self._get(("info", ticker.upper()))
+
+    def get_history(self, ticker, period="1y"):
+        return self._get(("history", ticker.upper(), period))
+
+    def refresh(self, ticker, periods=("1y",), min_age_fraction=0.5):
+        """
+        Fetch a ticker's quote, info and history synchronously if their cached
+        copies are older than min_age_fraction of their TTL. Used to keep a
+        watchlist warm.
+        """
+        ticker = ticker.upper()
+        now = time.time()
+        keys = [("quote", ticker), ("info", ticker)] + [("history", ticker, period) for period in periods]
+        for key in keys:
+            with self._lock:
+                entry = self._entries.get(key)
+                if entry is not None and now - entry[1] < self.ttls[key[0]] * min_age_fraction:
+                    continue
+            self._store(key, self._fetch(key))
+            with self._lock:
+                self._stats["refreshes"] += 1
+
+    def recent_tickers(self, within_s=60 * 60):
+        """Tickers requested in the last within_s seconds, most recent first."""
+        cutoff = time.time() - within_s
+        with self._lock:
+            return [ticker for ticker, seen in reversed(self._recent.items()) if seen >= cutoff]
+
+    def stats(self):
+        with self._lock:
+            snapshot = dict(self._stats)
+        if hasattr(self.inner, "stats"):
+            snapshot["coalescing"] = self.inner.stats()
+        return snapshot
+
+
+def synthesize_fixtures(tickers, fixture_dir=DEFAULT_FIXTURE_DIR, days=252, seed=0):
+    """
+    Write deterministic random-walk fixtures for tickers, for offline boxes
+    where nothing has been recorded.
+    """
+    dates = pd.bdate_range(end=pd.Timestamp("2026-01-02"), periods=days, name="Date")
+    for i, ticker in enumerate(tickers):
+        rng = np.random.default_rng(seed + i)
+        closes = (20 + 480 * rng.random()) * np.cumprod(1 + rng.normal(0.0004, 0.018, days))
+        opens = closes * (1 + rng.normal(0, 0.004, days))
+        history = pd.DataFrame({
+            "Open": opens,
+            "High": np.maximum(opens, closes) * (1 + np.abs(rng.normal(0, 0.006, days))),
+            "Low": np.minimum(opens, closes) * (1 - np.abs(rng.normal(0, 0.006, days))),
+            "Close": closes,
+            "Volume": rng.integers(1_000_000, 50_000_000, days)
+        }, index=dates)
+        path = os.path.join(fixture_dir, ticker.upper())
+        os.makedirs(path, exist_ok=True)
+        _write_history(os.path.join(path, "history_1y.csv"), history)
+        with open(os.path.join(path, "info.json"), "w") as f:
+            json.dump({"shortName": f"{ticker.upper()} (synthetic)", "symbol": ticker.upper()}, f)
+        with open(os.path.join(path, "quote.json"), "w") as f:
+            json.dump({"price": float(closes[-1])}, f)
+
+
+_provider = None
+_provider_lock = threading.Lock()
+
+
+def provider_from_env():
+    kind = os.environ.get("MARKET_DATA_PROVIDER", "yfinance").lower()
+    fixture_dir = os.environ.get("MARKET_DATA_FIXTURES", DEFAULT_FIXTURE_DIR)
+    if kind == "replay":
+        return ReplayProvider(fixture_dir, latency_ms=float(os.environ.get("MARKET_DATA_LATENCY_MS", 0)))
+    if kind == "record":
+        return RecordingProvider(YFinanceProvider(), fixture_dir)
+    if kind == "yfinance":
+        return YFinanceProvider()
+    raise ValueError(f"Unknown MARKET_DATA_PROVIDER '{kind}'. Use yfinance, record or replay.")
+
+
+def get_provider():
+    """Return the process-wide provider, creating it from the environment on first use."""
+    global _provider
+    with _provider_lock:
+        if _provider is None:
+            ttls = {"quote": float(os.environ.get("QUOTE_TTL_SECONDS", DEFAULT_TTLS["quote"]))}
+            max_stale = {"quote": float(os.environ.get("QUOTE_MAX_STALE_SECONDS", DEFAULT_MAX_STALE["quote"]))}
+            _provider = CachingProvider(CoalescingProvider(provider_from_env()), ttls=ttls, max_stale=max_stale)
+        return _provider
+
+
+def set_provider(provider, coalesce=True, cache=False):
+    """Replace the process-wide provider (e.g. with a ReplayProvider in benchmarks)."""
+    global _provider
+    with _provider_lock:
+        if coalesce:
+            provider = CoalescingProvider(provider)
+        if cache:
+            provider = CachingProvider(provider)
+        _provider = provider
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Record or synthesise market-data fixtures.")
+    parser.add_argument("command", choices=["record", "synthesize"])
+    parser.add_argument("tickers", nargs="+")
+    parser.add_argument("--fixtures", default=DEFAULT_FIXTURE_DIR)
+    parser.add_argument("--days", type=int, default=252)
+    args = parser.parse_args()
+
+    if args.command == "record":
+        recorder = RecordingProvider(YFinanceProvider(), args.fixtures)
+        for ticker in args.tickers:
+            recorder.get_quote(ticker)
+            recorder.get_info(ticker)
+            recorder.get_history(ticker, period="1y")
+            print(f"Recorded {ticker.upper()}")
+    else:
+        synthesize_fixtures(args.tickers, args.fixtures, days=args.days)
+        print(f"Synthesised {len(args.tickers)} ticker(s) in {args.fixtures}")
+
+
+if __name__ == "__main__":
+    main()
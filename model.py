@@ -1,4 +1,11 @@
 from transformers import AutoModelForSeq2SeqLM, AutoTokenizer
+from decoding import DEFAULT_PROFILE, generate_with_budget
+
+def build_prompt(query, context=""):
+    """Prefix the question with any context, such as earlier turns of the conversation."""
+    if not context.strip():
+        return query
+    return f"Context:\n{context.strip()}\n\nQuestion: {query}"
 
 class FinancialAssistant:
     def __init__(self, model_name="google/flan-t5-base"):
@@ -6,20 +13,26 @@ class FinancialAssistant:
         self.tokenizer = AutoTokenizer.from_pretrained(model_name)
         self.model = AutoModelForSeq2SeqLM.from_pretrained(model_name)
 
-    def generate_response(self, query):
-        inputs = self.tokenizer(query, return_tensors="pt")
-        output = self.model.generate(**inputs, max_length=150)
-        return self.tokenizer.decode(output[0], skip_special_tokens=True)
+    def generate_response(self, query, context="", profile=DEFAULT_PROFILE, budget_s=None):
+        inputs = self.tokenizer(build_prompt(query, context), return_tensors="pt", truncation=True, max_length=512)
+        response, _ = generate_with_budget(self.model, self.tokenizer, inputs, profile=profile, budget_s=budget_s)
+        return response
+
+if __name__ == "__main__":
+    from router import load_assistant
 
-# Initialize Assistant
-assistant = FinancialAssistant()
+    # Initialize Assistant (routes simple questions to the distilled small model if present)
+    assistant = load_assistant()
 
-# Interactive Mode
-print("\n🔹 AI Financial Assistant (Type 'exit' to quit) 🔹")
-while True:
-    user_input = input("\n💬 Ask a finance question: ")
-    if user_input.lower() == "exit":
-        print("👋 Goodbye!")
-        break
-    response = assistant.generate_response(user_input)
-    print("\n🤖 AI Advice:", response)
+    # Interactive Mode
+    print("\n🔹 AI Financial Assistant (Type 'exit' to quit) 🔹")
+    context = ""
+    while True:
+        user_input = input("\n💬 Ask a finance question: ")
+        if user_input.lower() == "exit":
+            print("👋 Goodbye!")
+            break
+        # The previous exchange is the context for follow-up questions
+        response = assistant.generate_response(user_input, context=context)
+        print("\n🤖 AI Advice:", response)
+        context = f"Previous question: {user_input}\nPrevious answer: {response}"
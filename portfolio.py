@@ -0,0 +1,193 @@
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from market_data import get_provider
+
+TRADING_DAYS = 252
+HISTORY_TTL_SECONDS = 15 * 60
+MAX_FETCH_WORKERS = 8
+
+# Close history per (ticker, period), shared so each ticker is fetched once per TTL
+_history_cache = {}
+_history_lock = threading.Lock()
+
+
+def _fetch_close_history(ticker, period):
+    history = get_provider().get_history(ticker, period=period)
+    if history.empty:
+        return None
+    closes = history["Close"]
+    # Different exchanges report different timezones; align on calendar dates
+    if closes.index.tz is not None:
+        closes.index = closes.index.tz_localize(None)
+    closes.index = closes.index.normalize()
+    return closes
+
+
+def get_close_histories(tickers, period="1y"):
+    """
+    Return {ticker: close Series} for the given tickers. Only tickers missing
+    from the cache (or expired) are fetched, in parallel, one fetch per ticker.
+    """
+    now = time.time()
+    histories = {}
+    missing = []
+    with _history_lock:
+        for ticker in dict.fromkeys(tickers):
+            entry = _history_cache.get((ticker, period))
+            if entry and now - entry[0] < HISTORY_TTL_SECONDS:
+                histories[ticker] = entry[1]
+            else:
+                missing.append(ticker)
+
+    if missing:
+        with ThreadPoolExecutor(max_workers=min(MAX_FETCH_WORKERS, len(missing))) as pool:
+            fetched = list(pool.map(lambda t: _fetch_close_history(t, period), missing))
+        with _history_lock:
+            for ticker, closes in zip(missing, fetched):
+                if closes is not None:
+                    _history_cache[(ticker, period)] = (now, closes)
+                    histories[ticker] = closes
+    return histories
+
+
+def align_closes(histories, tickers):
+    """
+    Build a (days, tickers) close matrix on the dates shared by all tickers.
+    Gaps from market holidays are forward-filled before trimming.
+    """
+    frame = pd.concat([histories[t] for t in tickers], axis=1, keys=tickers).sort_index()
+    frame = frame.ffill().dropna()
+    return frame.index, frame.to_numpy(dtype=np.float64)
+
+
+def aggregate_holdings(holdings):
+    """
+    Merge repeated tickers into one position each.
+    Returns tickers, total shares and share-weighted cost basis per share.
+    """
+    tickers = np.array([h["ticker"].upper() for h in holdings])
+    shares = np.array([float(h["shares"]) for h in holdings])
+    cost = np.array([float(h["cost_basis"]) for h in holdings])
+
+    unique, inverse = np.unique(tickers, return_inverse=True)
+    total_shares = np.bincount(inverse, weights=shares)
+    total_cost = np.bincount(inverse, weights=shares * cost)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        avg_cost = np.where(total_shares > 0, total_cost / total_shares, 0.0)
+    return list(unique), total_shares, avg_cost
+
+
+def max_drawdown(values):
+    """Largest peak-to-trough fall along axis 0, as a positive fraction."""
+    peaks = np.maximum.accumulate(values, axis=0)
+    return np.max(1 - values / peaks, axis=0)
+
+
+def analyze_portfolio(holdings, period="1y", risk_free_rate=0.04):
+    """
+    Value a list of holdings ({"ticker", "shares", "cost_basis"}) and compute
+    risk metrics from one aligned NumPy return matrix.
+    """
+    if not holdings:
+        return {"success": False, "message": "You don't have any holdings yet. Add one with 'hold AAPL 10 at 150'."}
+
+    tickers, shares, cost_basis = aggregate_holdings(holdings)
+    histories = get_close_histories(tickers, period)
+
+    missing = [t for t in tickers if t not in histories]
+    if missing:
+        keep = np.array([t in histories for t in tickers])
+        tickers = [t for t in tickers if t in histories]
+        shares, cost_basis = shares[keep], cost_basis[keep]
+    if not tickers:
+        return {"success": False, "message": f"Could not find price history for {', '.join(missing)}."}
+
+    dates, closes = align_closes(histories, tickers)
+    if len(dates) < 2:
+        return {"success": False, "message": "Not enough overlapping price history to compute risk metrics."}
+
+    # Valuation
+    prices = closes[-1]
+    values = shares * prices
+    cost_values = shares * cost_basis
+    pnl = values - cost_values
+    total_value = values.sum()
+    weights = values / total_value
+
+    # Risk, all from the same (days - 1, tickers) return matrix
+    returns = closes[1:] / closes[:-1] - 1
+    asset_vol = returns.std(axis=0, ddof=1) * np.sqrt(TRADING_DAYS)
+    portfolio_values = closes @ shares
+    portfolio_returns = portfolio_values[1:] / portfolio_values[:-1] - 1
+    annual_return = portfolio_returns.mean() * TRADING_DAYS
+    portfolio_vol = portfolio_returns.std(ddof=1) * np.sqrt(TRADING_DAYS)
+    sharpe = (annual_return - risk_free_rate) / portfolio_vol if portfolio_vol > 0 else float("nan")
+    drawdown = max_drawdown(portfolio_values)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        pnl_pct = np.where(cost_values > 0, pnl / cost_values * 100, 0.0)
+
+    if len(tickers) > 1:
+        correlation = np.corrcoef(returns, rowvar=False)
+    else:
+        correlation = np.ones((1, 1))
+
+    positions = pd.DataFrame({
+        "Ticker": tickers,
+        "Shares": shares,
+        "Cost Basis": cost_basis,
+        "Price": prices,
+        "Value": values,
+        "P&L": pnl,
+        "P&L %": pnl_pct,
+        "Weight %": weights * 100,
+        "Volatility %": asset_vol * 100,
+        "Max Drawdown %": max_drawdown(closes) * 100
+    })
+
+    message = f"Your portfolio of {len(tickers)} position(s) is worth ${total_value:,.2f} "
+    message += f"(P&L ${pnl.sum():+,.2f} on a cost of ${cost_values.sum():,.2f}).\n\n"
+    message += f"• Annualised volatility: {portfolio_vol * 100:.1f}%\n"
+    message += f"• Sharpe ratio: {sharpe:.2f} (risk-free rate {risk_free_rate * 100:.1f}%)\n"
+    message += f"• Max drawdown: {drawdown * 100:.1f}%\n"
+    if missing:
+        message += f"\nNo price history found for: {', '.join(missing)}."
+
+    return {
+        "success": True,
+        "message": message,
+        "positions": positions,
+        "total_value": total_value,
+        "total_pnl": pnl.sum(),
+        "volatility": portfolio_vol,
+        "sharpe": sharpe,
+        "max_drawdown": drawdown,
+        "correlation": pd.DataFrame(correlation, index=tickers, columns=tickers),
+        "value_history": pd.Series(portfolio_values, index=dates)
+    }
+
+
+def parse_holding_command(text):
+    """
+    Parse 'hold AAPL 10 at 150' or 'hold 10 AAPL @ $150.50'.
+    Returns a holding dict or None.
+    """
+    patterns = [
+        r'^(?:hold|add holding|buy holding)\s+([A-Za-z.\-]+)\s+(\d+(?:\.\d+)?)\s*(?:shares?)?\s*(?:at|@)\s*\$?(\d+(?:,\d{3})*(?:\.\d+)?)',
+        r'^(?:hold|add holding|buy holding)\s+(\d+(?:\.\d+)?)\s*(?:shares? (?:of )?)?([A-Za-z.\-]+)\s*(?:at|@)\s*\$?(\d+(?:,\d{3})*(?:\.\d+)?)'
+    ]
+    text = text.strip()
+    match = re.match(patterns[0], text, re.IGNORECASE)
+    if match:
+        ticker, shares, cost = match.groups()
+    else:
+        match = re.match(patterns[1], text, re.IGNORECASE)
+        if not match:
+            return None
+        shares, ticker, cost = match.groups()
+    return {"ticker": ticker.upper(), "shares": float(shares), "cost_basis": float(cost.replace(',', ''))}
@@ -0,0 +1,230 @@
+"""
+On-demand sampling profiler for chat turns.
+
+When a turn is selected, a sampler thread reads the answering thread's stack
+from sys._current_frames() every few milliseconds until the turn finishes.
+Identical stacks are counted and written in the collapsed ("folded") format
+that flamegraph.pl, speedscope and inferno read:
+
+    ask_question;engine.py:handle_screen_query;universe.py:ensure 12
+
+Each capture also gets a JSON sidecar with the intent, stage timings, total
+time and sample count, and the file name carries the intent, so slow turns of
+one kind are easy to pick out.
+
+Turns are selected by a random sample rate, or because an admin asked to
+profile a session's next question. Profiling is off unless enabled. When off,
+the only cost per turn is one attribute check, and no thread is started.
+    PROFILE_SAMPLE_RATE=0.01 PROFILE_DIR=logs/profiles streamlit run app.py
+    python profiling.py logs/profiles            # list captures
+    python profiling.py logs/profiles/<file>.folded
+"""
+import argparse
+import glob
+import itertools
+import json
+import os
+import random
+import sys
+import threading
+import time
+from collections import Counter
+
+DEFAULT_DIR = "logs/profiles"
+DEFAULT_INTERVAL_MS = 5.0
+MAX_RECENT = 50
+
+
+def frame_label(frame):
+    code = frame.f_code
+    return f"{os.path.basename(code.co_filename)}:{code.co_name}"
+
+
+def collapse(frame, root=None):
+    """Semicolon-joined stack from the outermost frame (or just below root) to frame."""
+    labels = []
+    while frame is not None and frame is not root:
+        labels.append(frame_label(frame))
+        frame = frame.f_back
+    return ";".join(reversed(labels))
+
+
+class StackSampler:
+    """Samples one thread's stack on a background thread and counts collapsed stacks."""
+
+    def __init__(self, thread_id, interval_s, root=None):
+        self.thread_id = thread_id
+        self.interval_s = interval_s
+        self.root = root
+        self.counts = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="profiler", daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.interval_s):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            self.counts[collapse(frame, self.root)] += 1
+            self.samples += 1
+            del frame
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        return self.counts
+
+
+class Profiler:
+    """
+    Decides which turns to profile and writes their captures. Shared by every
+    session in the process; enabled, sample_rate and selections may be changed
+    at any time.
+    """
+
+    def __init__(self, output_dir=DEFAULT_DIR, sample_rate=0.0, interval_ms=DEFAULT_INTERVAL_MS, enabled=None):
+        self.output_dir = output_dir
+        self.sample_rate = sample_rate
+        self.interval_ms = interval_ms
+        self.enabled = sample_rate > 0 if enabled is None else enabled
+        self._selected = set()
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+        self.recent = []
+
+    def select(self, session_id):
+        """Profile the next turn from this session, regardless of the sample rate."""
+        with self._lock:
+            self._selected.add(session_id)
+
+    def should_profile(self, session_id=None):
+        if not self.enabled:
+            return False
+        with self._lock:
+            if session_id in self._selected:
+                self._selected.discard(session_id)
+                return True
+        return random.random() < self.sample_rate
+
+    def run(self, fn, *args, session_id=None, tags=None, **kwargs):
+        """
+        Call fn(*args, **kwargs), profiling it if this turn is selected. The intent
+        and timings of a dict result are added to the capture's tags.
+        """
+        if not self.should_profile(session_id):
+            return fn(*args, **kwargs)
+
+        sampler = StackSampler(threading.get_ident(), self.interval_ms / 1000, root=sys._getframe()).start()
+        start = time.perf_counter()
+        tags = dict(tags or {})
+        try:
+            result = fn(*args, **kwargs)
+        except BaseException as e:
+            tags["error"] = type(e).__name__
+            raise
+        else:
+            if isinstance(result, dict):
+                tags.setdefault("intent", result.get("intent"))
+                tags.setdefault("timings_ms", result.get("timings"))
+            return result
+        finally:
+            total_ms = (time.perf_counter() - start) * 1000
+            counts = sampler.stop()
+            try:
+                self.save(counts, sampler.samples, total_ms, session_id, tags)
+            except OSError as e:
+                print(f"Could not save profile: {e}")
+
+    def save(self, counts, samples, total_ms, session_id, tags):
+        """Write the folded stacks and their JSON sidecar. Returns the metadata."""
+        os.makedirs(self.output_dir, exist_ok=True)
+        intent = tags.get("error") or tags.get("intent") or "unknown"
+        stamp = time.strftime("%Y%m%d-%H%M%S")
+        name = f"{stamp}-{next(self._ids):04d}-{intent}-{int(total_ms)}ms"
+        folded_path = os.path.join(self.output_dir, name + ".folded")
+        with open(folded_path, "w") as f:
+            for stack, count in counts.most_common():
+                f.write(f"{stack} {count}\n")
+
+        meta = dict(tags, session=session_id, total_ms=round(total_ms, 2), samples=samples,
+                    interval_ms=self.interval_ms, ts=time.time(), folded=os.path.basename(folded_path))
+        with open(os.path.join(self.output_dir, name + ".json"), "w") as f:
+            json.dump(meta, f, indent=2, default=str)
+        with self._lock:
+            self.recent.append(dict(meta, path=folded_path))
+            del self.recent[:-MAX_RECENT]
+        return meta
+
+
+def profiler_from_env():
+    """Build a Profiler from PROFILE_SAMPLE_RATE, PROFILE_DIR and PROFILE_INTERVAL_MS. Off when the rate is 0."""
+    return Profiler(
+        output_dir=os.environ.get("PROFILE_DIR", DEFAULT_DIR),
+        sample_rate=float(os.environ.get("PROFILE_SAMPLE_RATE", 0)),
+        interval_ms=float(os.environ.get("PROFILE_INTERVAL_MS", DEFAULT_INTERVAL_MS))
+    )
+
+
+def load_folded(path):
+    counts = Counter()
+    with open(path) as f:
+        for line in f:
+            stack, _, count = line.rstrip("\n").rpartition(" ")
+            if stack:
+                counts[stack] += int(count)
+    return counts
+
+
+def top_frames(counts, n=15):
+    """The n frames with the most samples on top of the stack (self) and anywhere on it (total)."""
+    self_counts = Counter()
+    total_counts = Counter()
+    for stack, count in counts.items():
+        frames = stack.split(";")
+        self_counts[frames[-1]] += count
+        for frame in set(frames):
+            total_counts[frame] += count
+    return self_counts.most_common(n), total_counts.most_common(n)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="List profile captures or summarise one.")
+    parser.add_argument("path", nargs="?", default=DEFAULT_DIR, help="Capture directory or a .folded file")
+    parser.add_argument("--top", type=int, default=15)
+    args = parser.parse_args()
+
+    if os.path.isdir(args.path):
+        captures = sorted(glob.glob(os.path.join(args.path, "*.json")))
+        if not captures:
+            print(f"No captures in {args.path}")
+        for path in captures:
+            with open(path) as f:
+                meta = json.load(f)
+            print(f"{meta['folded']:<50}{meta.get('intent') or '-':>14}{meta['total_ms']:>10.1f} ms{meta['samples']:>7} samples")
+        return
+
+    counts = load_folded(args.path)
+    total = sum(counts.values()) or 1
+    sidecar = os.path.splitext(args.path)[0] + ".json"
+    if os.path.exists(sidecar):
+        with open(sidecar) as f:
+            meta = json.load(f)
+        print(f"Intent {meta.get('intent')}, {meta['total_ms']:.1f} ms, {meta['samples']} samples every {meta['interval_ms']:g} ms")
+        for stage, ms in (meta.get("timings_ms") or {}).items():
+            print(f"  {stage:<16}{ms:>10.2f} ms")
+        print()
+    self_top, total_top = top_frames(counts, args.top)
+    for title, rows in [("Self", self_top), ("Total", total_top)]:
+        print(f"{title:<60}{'Samples':>9}{'%':>7}")
+        for frame, count in rows:
+            print(f"{frame:<60}{count:>9}{100 * count / total:>7.1f}")
+        print()
+
+
+if __name__ == "__main__":
+    main()
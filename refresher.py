@@ -0,0 +1,94 @@
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from market_data import get_provider
+
+DEFAULT_REFRESH_SECONDS = 30
+# Named ticker sets (e.g. one session's holdings) are dropped if not renewed for this long
+TICKER_SET_TTL_SECONDS = 60 * 60
+
+
+class WatchlistRefresher:
+    """
+    Background thread that keeps a watchlist warm in the CachingProvider.
+
+    The watchlist combines static tickers, named ticker sets registered by the
+    app (e.g. each session's holdings) and tickers queried recently.
+    """
+
+    def __init__(self, provider=None, interval_s=DEFAULT_REFRESH_SECONDS, static_tickers=(),
+                 recent_window_s=60 * 60, max_workers=4):
+        self.provider = provider or get_provider()
+        self.interval_s = interval_s
+        self.static_tickers = [t.upper() for t in static_tickers]
+        self.recent_window_s = recent_window_s
+        self.max_workers = max_workers
+        self._lock = threading.Lock()
+        self._ticker_sets = {}
+        self._stop = threading.Event()
+        self._thread = None
+        self.last_run = None
+        self.last_duration_s = None
+
+    def set_tickers(self, name, tickers):
+        """Register or replace a named set of tickers to keep warm."""
+        with self._lock:
+            self._ticker_sets[name] = ([t.upper() for t in tickers], time.time())
+
+    def watchlist(self):
+        now = time.time()
+        tickers = list(self.static_tickers)
+        with self._lock:
+            for name, (names, updated_at) in list(self._ticker_sets.items()):
+                if now - updated_at > TICKER_SET_TTL_SECONDS:
+                    del self._ticker_sets[name]
+                else:
+                    tickers.extend(names)
+        if hasattr(self.provider, "recent_tickers"):
+            tickers.extend(self.provider.recent_tickers(self.recent_window_s))
+        return list(dict.fromkeys(tickers))
+
+    def _refresh(self, ticker):
+        try:
+            self.provider.refresh(ticker)
+        except Exception as e:
+            print(f"Watchlist refresh of {ticker} failed: {e}")
+
+    def refresh_once(self):
+        tickers = self.watchlist()
+        start = time.perf_counter()
+        if tickers:
+            with ThreadPoolExecutor(max_workers=min(self.max_workers, len(tickers))) as pool:
+                list(pool.map(self._refresh, tickers))
+        self.last_run = time.time()
+        self.last_duration_s = time.perf_counter() - start
+        return tickers
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.refresh_once()
+            self._stop.wait(self.interval_s)
+
+    def start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="watchlist-refresher", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+
+def refresher_from_env(static_tickers=()):
+    """
+    Build a refresher configured by WATCHLIST (comma-separated tickers added to
+    static_tickers) and WATCHLIST_REFRESH_SECONDS.
+    """
+    extra = [t.strip() for t in os.environ.get("WATCHLIST", "").split(",") if t.strip()]
+    interval = float(os.environ.get("WATCHLIST_REFRESH_SECONDS", DEFAULT_REFRESH_SECONDS))
+    return WatchlistRefresher(interval_s=interval, static_tickers=list(static_tickers) + extra)
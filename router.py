@@ -0,0 +1,96 @@
+import os
+import re
+import threading
+import time
+
+from decoding import DEFAULT_PROFILE
+from model import FinancialAssistant
+
+SMALL_MODEL_PATH = "./models/flan-t5-small-distilled"
+BASE_MODEL_NAME = "google/flan-t5-base"
+
+# Questions at or below these limits go to the small tier
+MAX_SIMPLE_WORDS = 14
+MAX_SIMPLE_CLAUSES = 1
+
+# Openers of short definitional questions like the ones in finance_data.json
+SIMPLE_PATTERNS = [
+    r'^(what|who) (is|are) (a|an|the)?\s*\w+',
+    r'^(define|explain|describe) ',
+    r'^what does .+ mean',
+    r'^how (does|do) .+ work',
+    r'^is .+ (a|an) (good|bad|safe|risky) '
+]
+
+# Signals that a question needs reasoning over numbers or personal data
+COMPLEX_MARKERS = [
+    r'\d',
+    r'\b(my|our|i have|i earn|i make)\b',
+    r'\b(compare|versus|vs\.?|should i|calculate|plan|strategy)\b'
+]
+
+
+def estimate_complexity(question, context=""):
+    """
+    Score how much reasoning a question needs. Returns 0 for short definitional
+    questions; each extra clause, long phrasing or complexity marker adds one.
+    """
+    text = question.lower().strip()
+    words = text.split()
+    clauses = len(re.findall(r'[,;]| and | but | or | if | because ', text)) + 1
+
+    score = 0
+    if len(words) > MAX_SIMPLE_WORDS:
+        score += 1
+    if clauses > MAX_SIMPLE_CLAUSES:
+        score += clauses - MAX_SIMPLE_CLAUSES
+    for pattern in COMPLEX_MARKERS:
+        if re.search(pattern, text):
+            score += 1
+    if context.strip():
+        score += 1
+    if not any(re.search(pattern, text) for pattern in SIMPLE_PATTERNS):
+        score += 1
+    return score
+
+
+def choose_tier(question, context="", threshold=1):
+    """Return "small" for simple prompts and "base" for everything else."""
+    return "small" if estimate_complexity(question, context) < threshold else "base"
+
+
+class TieredAssistant:
+    """
+    Routing layer in front of FinancialAssistant. Simple prompts are answered by
+    a distilled flan-t5-small student; the rest go to flan-t5-base.
+    """
+
+    def __init__(self, small_model_name=SMALL_MODEL_PATH, base_model_name=BASE_MODEL_NAME, threshold=1):
+        self.threshold = threshold
+        self.tiers = {
+            "small": FinancialAssistant(small_model_name),
+            "base": FinancialAssistant(base_model_name)
+        }
+        self._lock = threading.Lock()
+        self.stats = {tier: {"requests": 0, "total_seconds": 0.0} for tier in self.tiers}
+
+    def route(self, query, context=""):
+        return choose_tier(query, context, self.threshold)
+
+    def generate_response(self, query, context="", profile=DEFAULT_PROFILE, budget_s=None):
+        tier = self.route(query, context)
+        start = time.perf_counter()
+        response = self.tiers[tier].generate_response(query, context=context, profile=profile, budget_s=budget_s)
+        elapsed = time.perf_counter() - start
+
+        with self._lock:
+            self.stats[tier]["requests"] += 1
+            self.stats[tier]["total_seconds"] += elapsed
+        return response
+
+
+def load_assistant():
+    """Use the tiered assistant when a distilled student exists, else base only."""
+    if os.path.isdir(SMALL_MODEL_PATH):
+        return TieredAssistant()
+    return FinancialAssistant(BASE_MODEL_NAME)
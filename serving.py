@@ -0,0 +1,279 @@
+"""
+Multi-process model serving with shared, memory-mapped weights.
+
+The model's weights are exported once to a single file. Each inference worker
+builds the model skeleton on the meta device and maps that file read-only with
+torch.load(mmap=True), so all workers share the same physical pages through
+the OS page cache instead of holding private copies. Each worker pins its
+intra-op thread count so the pool does not oversubscribe the cores, and
+requests go to the worker with the fewest requests in flight.
+
+Usage:
+    python serving.py export                      # write models/flan-t5-base.pt
+    python serving.py chat --workers 4            # chat through a worker pool
+    python -m benchmarks.serving_benchmark        # RSS and throughput by worker count
+"""
+import argparse
+import itertools
+import multiprocessing as mp
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+import torch
+from transformers import AutoConfig, AutoModelForSeq2SeqLM, AutoTokenizer
+
+from decoding import DEFAULT_PROFILE, generate_with_budget
+
+DEFAULT_MODEL_NAME = "google/flan-t5-base"
+WEIGHTS_DIR = "models"
+STARTUP_TIMEOUT_S = 600
+# How often the server checks that its workers are still alive
+LIVENESS_POLL_S = 1.0
+
+
+def weights_path_for(model_name):
+    return os.path.join(WEIGHTS_DIR, model_name.rstrip("/").split("/")[-1] + ".pt")
+
+
+def export_weights(model_name=DEFAULT_MODEL_NAME, path=None):
+    """Save the model's state dict to a single mmap-able file and return its path."""
+    path = path or weights_path_for(model_name)
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    model = AutoModelForSeq2SeqLM.from_pretrained(model_name)
+    torch.save(model.state_dict(), path)
+    return path
+
+
+def load_shared_model(model_name, weights_path):
+    """
+    Build the model without allocating weights, then point its parameters at the
+    memory-mapped file. Nothing writes to them during inference, so the pages stay shared.
+    """
+    config = AutoConfig.from_pretrained(model_name)
+    with torch.device("meta"):
+        model = AutoModelForSeq2SeqLM.from_config(config)
+    state_dict = torch.load(weights_path, mmap=True, weights_only=True, map_location="cpu")
+    model.load_state_dict(state_dict, assign=True)
+    model.tie_weights()
+    model.eval()
+    model.requires_grad_(False)
+    return model
+
+
+def _worker_main(worker_id, model_name, weights_path, num_threads, requests, responses):
+    torch.set_num_threads(num_threads)
+    try:
+        torch.set_num_interop_threads(1)
+    except RuntimeError:
+        pass  # Already set in this process
+    try:
+        tokenizer = AutoTokenizer.from_pretrained(model_name)
+        model = load_shared_model(model_name, weights_path)
+    except Exception as e:
+        responses.put(("failed", worker_id, os.getpid(), None, f"{type(e).__name__}: {e}"))
+        return
+    responses.put(("ready", worker_id, os.getpid(), None, None))
+
+    while True:
+        request = requests.get()
+        if request is None:
+            break
+        request_id, prompt, profile, budget_s = request
+        try:
+            inputs = tokenizer(prompt, return_tensors="pt", truncation=True, max_length=512)
+            text, info = generate_with_budget(model, tokenizer, inputs, profile=profile, budget_s=budget_s)
+            responses.put((request_id, worker_id, text, info, None))
+        except Exception as e:
+            responses.put((request_id, worker_id, None, None, f"{type(e).__name__}: {e}"))
+
+
+class ModelServer:
+    """
+    A pool of inference worker processes sharing one read-only copy of the weights.
+
+    start() raises if a worker fails to load the model or does not report ready
+    within startup_timeout_s. If a worker dies later, its in-flight requests
+    fail with RuntimeError and new requests go to the remaining workers.
+    """
+
+    def __init__(self, model_name=DEFAULT_MODEL_NAME, num_workers=None, threads_per_worker=None, weights_path=None,
+                 startup_timeout_s=STARTUP_TIMEOUT_S):
+        cores = os.cpu_count() or 1
+        self.model_name = model_name
+        self.num_workers = num_workers or max(1, cores // 2)
+        self.threads_per_worker = threads_per_worker or max(1, cores // self.num_workers)
+        self.weights_path = weights_path or weights_path_for(model_name)
+        self.startup_timeout_s = startup_timeout_s
+        self.worker_pids = []
+        self._ctx = mp.get_context("spawn")
+        self._processes = []
+        self._request_queues = []
+        self._responses = None
+        self._in_flight = []
+        self._alive = []
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._ids = itertools.count()
+        self._collector = None
+
+    def start(self):
+        if not os.path.exists(self.weights_path):
+            print(f"Exporting weights to {self.weights_path}...")
+            export_weights(self.model_name, self.weights_path)
+
+        self._responses = self._ctx.Queue()
+        for worker_id in range(self.num_workers):
+            requests = self._ctx.Queue()
+            process = self._ctx.Process(
+                target=_worker_main,
+                args=(worker_id, self.model_name, self.weights_path, self.threads_per_worker, requests, self._responses),
+                daemon=True
+            )
+            process.start()
+            self._processes.append(process)
+            self._request_queues.append(requests)
+            self._in_flight.append(0)
+            self._alive.append(True)
+
+        # Wait until every worker has mapped the weights
+        pids = {}
+        deadline = time.monotonic() + self.startup_timeout_s
+        while len(pids) < self.num_workers:
+            try:
+                status, worker_id, pid, _, error = self._responses.get(timeout=LIVENESS_POLL_S)
+            except queue.Empty:
+                dead = [i for i, process in enumerate(self._processes) if i not in pids and not process.is_alive()]
+                if dead:
+                    self._terminate()
+                    raise RuntimeError(f"Worker {dead[0]} exited with code {self._processes[dead[0]].exitcode} "
+                                       f"while loading {self.weights_path}")
+                if time.monotonic() > deadline:
+                    self._terminate()
+                    raise TimeoutError(f"Workers not ready after {self.startup_timeout_s}s")
+                continue
+            if status == "failed":
+                self._terminate()
+                raise RuntimeError(f"Worker {worker_id} failed to load {self.model_name}: {error}")
+            pids[worker_id] = pid
+        self.worker_pids = [pids[i] for i in range(self.num_workers)]
+
+        self._collector = threading.Thread(target=self._collect, name="model-server-collector", daemon=True)
+        self._collector.start()
+        return self
+
+    def _collect(self):
+        last_check = time.monotonic()
+        while True:
+            try:
+                message = self._responses.get(timeout=LIVENESS_POLL_S)
+            except queue.Empty:
+                message = ()
+            if time.monotonic() - last_check >= LIVENESS_POLL_S:
+                self._check_workers()
+                last_check = time.monotonic()
+            if message is None:
+                break
+            if not message:
+                continue
+            request_id, worker_id, text, info, error = message
+            with self._lock:
+                future, _ = self._pending.pop(request_id, (None, None))
+                if future is not None:
+                    self._in_flight[worker_id] -= 1
+            if future is None:
+                continue  # Already failed when its worker was found dead
+            if error:
+                future.set_exception(RuntimeError(error))
+            else:
+                future.set_result((text, info))
+
+    def _check_workers(self):
+        """Mark workers that have exited as dead and fail the requests they held."""
+        for worker_id, process in enumerate(self._processes):
+            if not self._alive[worker_id] or process.is_alive():
+                continue
+            with self._lock:
+                self._alive[worker_id] = False
+                lost = [rid for rid, (_, owner) in self._pending.items() if owner == worker_id]
+                futures = [self._pending.pop(rid)[0] for rid in lost]
+                self._in_flight[worker_id] = 0
+            for future in futures:
+                future.set_exception(RuntimeError(f"Worker {worker_id} exited with code {process.exitcode}"))
+
+    def submit(self, prompt, profile=DEFAULT_PROFILE, budget_s=None):
+        """Queue a prompt on the least-loaded live worker. Returns a Future of (text, info)."""
+        future = Future()
+        with self._lock:
+            alive = [i for i in range(self.num_workers) if self._alive[i]]
+            if not alive:
+                raise RuntimeError("No model workers are running")
+            worker_id = min(alive, key=lambda i: self._in_flight[i])
+            self._in_flight[worker_id] += 1
+            request_id = next(self._ids)
+            self._pending[request_id] = (future, worker_id)
+        self._request_queues[worker_id].put((request_id, prompt, profile, budget_s))
+        return future
+
+    def generate(self, prompt, profile=DEFAULT_PROFILE, budget_s=None):
+        text, _ = self.submit(prompt, profile, budget_s).result()
+        return text
+
+    def load(self):
+        """Requests in flight per worker."""
+        with self._lock:
+            return list(self._in_flight)
+
+    def _terminate(self):
+        for process in self._processes:
+            if process.is_alive():
+                process.terminate()
+            process.join(timeout=10)
+
+    def shutdown(self):
+        for requests in self._request_queues:
+            requests.put(None)
+        for process in self._processes:
+            process.join(timeout=10)
+        if self._responses is not None:
+            self._responses.put(None)
+        if self._collector is not None:
+            self._collector.join(timeout=10)
+        with self._lock:
+            futures = [future for future, _ in self._pending.values()]
+            self._pending.clear()
+        for future in futures:
+            future.set_exception(RuntimeError("Model server shut down"))
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.shutdown()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export shared weights or chat through a worker pool.")
+    parser.add_argument("command", choices=["export", "chat"])
+    parser.add_argument("--model", default=DEFAULT_MODEL_NAME)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--threads", type=int, default=None)
+    args = parser.parse_args()
+
+    if args.command == "export":
+        print(f"Weights written to {export_weights(args.model)}")
+        return
+
+    with ModelServer(args.model, args.workers, args.threads) as server:
+        print(f"Serving {args.model} on {server.num_workers} worker(s) x {server.threads_per_worker} thread(s). Type 'exit' to quit.")
+        while True:
+            user_input = input("\n💬 Ask a finance question: ")
+            if user_input.lower() == "exit":
+                break
+            print("\n🤖 AI Advice:", server.generate(user_input))
+
+
+if __name__ == "__main__":
+    main()
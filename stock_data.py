@@ -1,8 +1,9 @@
-import yfinance as yf
+from market_data import get_provider
 
 def get_stock_price(ticker):
-    stock = yf.Ticker(ticker)
-    price = stock.history(period="1d")["Close"].iloc[-1]
+    price = get_provider().get_quote(ticker)
+    if price is None:
+        return f"Could not find data for ticker symbol {ticker.upper()}."
     return f"The latest price of {ticker.upper()} is ${price:.2f}"
 
 # Example Usage
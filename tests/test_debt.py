@@ -0,0 +1,46 @@
+from debt import optimize_debt_payoff
+
+
+def monthly_loop(debts, budget, order, max_months=600):
+    """Reference payoff: one debt at a time, month by month."""
+    balances = [float(d["balance"]) for d in debts]
+    month = 0
+    while any(b > 0.005 for b in balances) and month < max_months:
+        month += 1
+        balances = [b * (1 + d["apr"] / 1200) for b, d in zip(balances, debts)]
+        left = budget
+        for i, d in enumerate(debts):
+            if balances[i] > 0.005:
+                payment = min(d["minimum"], balances[i])
+                balances[i] -= payment
+                left -= payment
+        for i in order:
+            payment = min(left, balances[i])
+            balances[i] -= payment
+            left -= payment
+        balances = [0.0 if b <= 0.005 else b for b in balances]
+    return month
+
+
+def test_mixed_rates_pay_off_while_total_grows():
+    # The mortgage accrues more than its minimum, so the total balance grows
+    # for years while the extra goes to the card first
+    debts = [
+        {"name": "Mortgage", "balance": 200000, "apr": 5, "minimum": 100},
+        {"name": "Card", "balance": 20000, "apr": 24, "minimum": 50}
+    ]
+    result = optimize_debt_payoff(debts, 1200, start_date="2025-01-01")
+
+    assert result["success"]
+    summary = result["summary"].set_index("Strategy")
+    assert summary.loc["Avalanche", "Months"] == monthly_loop(debts, 1200, order=[1, 0]) == 362
+    assert summary["Total Interest"].notna().all()
+    assert "never" not in result["message"]
+
+
+def test_budget_below_interest_is_never_paid_off():
+    debts = [{"name": "Loan", "balance": 100000, "apr": 12, "minimum": 100}]
+    result = optimize_debt_payoff(debts, 1000)
+
+    assert result["summary"]["Months"].isna().all()
+    assert "doesn't cover the interest" in result["message"]
@@ -0,0 +1,38 @@
+import torch
+
+from decoding import DeadlineStoppingCriteria
+
+VOCAB = ["<pad>", "</s>", "▁The", "▁rate", "▁is", "▁4", ".", "5%", "▁Next"]
+PAD, EOS, THE, RATE, IS, FOUR, DOT, FIVE, NEXT = range(len(VOCAB))
+
+
+class FakeTokenizer:
+    eos_token_id = EOS
+    pad_token_id = PAD
+
+    def __len__(self):
+        return len(VOCAB)
+
+    def convert_ids_to_tokens(self, ids):
+        return [VOCAB[i] for i in ids]
+
+
+TOKENIZER = FakeTokenizer()
+
+
+def stop(ids, budget_s, soft_fraction):
+    criteria = DeadlineStoppingCriteria(TOKENIZER, budget_s, soft_fraction=soft_fraction)
+    done = criteria(torch.tensor([ids]), None)
+    return bool(done[0]), criteria.cut_short
+
+
+def test_soft_deadline_waits_for_a_sentence_end():
+    assert stop([PAD, THE, RATE, IS, FOUR, DOT], 60, 0.0) == (False, False)
+    assert stop([PAD, THE, RATE, IS, FOUR, DOT, FIVE], 60, 0.0) == (False, False)
+    assert stop([PAD, THE, RATE, IS, FOUR, DOT, FIVE, DOT, NEXT], 60, 0.0) == (True, True)
+
+
+def test_answer_ending_with_eos_is_not_cut_short():
+    assert stop([PAD, THE, RATE, IS, FOUR, DOT, FIVE, DOT, EOS], 60, 0.0) == (True, False)
+    assert stop([PAD, THE, RATE, IS, FIVE, DOT, EOS], 0, 1.0) == (True, False)
+    assert stop([PAD, THE, RATE, IS], 0, 1.0) == (True, True)
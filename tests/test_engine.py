@@ -0,0 +1,28 @@
+from engine import Session, handle_screen_query
+
+
+def test_job_changes_merge_into_the_current_session():
+    live = Session({"income": "$5,000"}, [{"ticker": "AAPL", "shares": 10}], [], ["MSFT"])
+    base = Session.copy_of(live)
+    job_session = Session.copy_of(base)
+
+    job_session.holdings.append({"ticker": "NVDA", "shares": 2})
+    job_session.watchlist.remove("MSFT")
+    job_session.watchlist.append("TSLA")
+    job_session.user_data["stock_TSLA"] = "$250.00"
+    assert live.watchlist == ["MSFT"]
+
+    # Meanwhile the user cleared their holdings and watched TSLA themselves
+    live.holdings = []
+    live.watchlist.append("TSLA")
+    job_session.apply_changes(base, live)
+
+    assert live.holdings == [{"ticker": "NVDA", "shares": 2}]
+    assert live.watchlist == ["TSLA"]
+    assert live.user_data == {"income": "$5,000", "stock_TSLA": "$250.00"}
+
+
+def test_watch_in_a_sentence_is_not_a_watchlist_command():
+    session = Session()
+    assert handle_screen_query("watch out for scams", session, []) is None
+    assert session.watchlist == []
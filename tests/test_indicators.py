@@ -0,0 +1,35 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from indicators import IndicatorCache, parse_overlay_request
+
+
+@pytest.mark.parametrize("question", [
+    "Show me small cap stocks like TSLA",
+    "How should I diversify beyond TSLA?",
+    "Is there a schema for TSLA data?",
+    "Is TSLA's volatility too high for me?"
+])
+def test_words_containing_indicator_names_add_no_overlay(question):
+    assert parse_overlay_request(question) == []
+
+
+def test_overlays_in_mention_order():
+    assert parse_overlay_request("Show TSLA with 50-day SMA, RSI and 30-day volatility") == [
+        ("sma", 50), ("rsi", 14), ("volatility", 30)
+    ]
+
+
+def test_cache_refits_when_a_seen_bar_changes():
+    dates = pd.bdate_range("2024-01-02", periods=80)
+    closes = pd.Series(np.linspace(100.0, 110.0, 80), index=dates)
+    cache = IndicatorCache()
+    cache.compute("TSLA", closes, "sma", 50)
+
+    # The last bar was intraday and has since closed much higher
+    closes.iloc[-1] = 1000.0
+    assert cache.compute("TSLA", closes, "sma", 50)["sma"][-1] == pytest.approx(closes.iloc[-50:].mean())
+
+    closes[dates[-1] + pd.offsets.BDay()] = 1001.0
+    assert cache.compute("TSLA", closes, "sma", 50)["sma"][-1] == pytest.approx(closes.iloc[-50:].mean())
@@ -0,0 +1,55 @@
+import pandas as pd
+
+from market_data import CachingProvider, MarketDataProvider
+
+
+class FakeProvider(MarketDataProvider):
+    """Counts fetches; quotes come from a dict, unknown tickers return None."""
+
+    def __init__(self, quotes):
+        self.quotes = quotes
+        self.calls = 0
+
+    def get_quote(self, ticker):
+        self.calls += 1
+        return self.quotes.get(ticker)
+
+    def get_info(self, ticker):
+        return {}
+
+    def get_history(self, ticker, period="1y"):
+        return pd.DataFrame()
+
+
+def test_entries_past_max_stale_block_on_a_fresh_fetch(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr("market_data.time.time", lambda: now[0])
+    inner = FakeProvider({"AAPL": 100.0})
+    cache = CachingProvider(inner, ttls={"quote": 60}, max_stale={"quote": 900})
+    assert cache.get_quote("AAPL") == 100.0
+
+    # Days later the old quote must not be served as the latest price
+    inner.quotes["AAPL"] = 120.0
+    now[0] += 3 * 24 * 60 * 60
+    assert cache.get_quote("AAPL") == 120.0
+    assert inner.calls == 2
+
+
+def test_entries_are_capped_least_recently_used_first():
+    inner = FakeProvider({"AAPL": 1.0, "MSFT": 2.0, "NVDA": 3.0})
+    cache = CachingProvider(inner, max_entries=2)
+    cache.get_quote("AAPL")
+    cache.get_quote("MSFT")
+    cache.get_quote("AAPL")
+    cache.get_quote("NVDA")
+
+    assert list(cache._entries) == [("quote", "AAPL"), ("quote", "NVDA")]
+    assert cache.stats()["evictions"] == 1
+
+
+def test_only_tickers_with_data_are_recent():
+    cache = CachingProvider(FakeProvider({"AAPL": 1.0}))
+    cache.get_quote("AAPL")
+    cache.get_quote("NOTATICKER")
+
+    assert cache.recent_tickers() == ["AAPL"]
@@ -0,0 +1,25 @@
+import threading
+
+from router import TieredAssistant
+
+
+class RecordingTier:
+    def __init__(self):
+        self.calls = []
+
+    def generate_response(self, query, context="", profile=None, budget_s=None):
+        self.calls.append((query, context))
+        return "answer"
+
+
+def test_context_reaches_the_chosen_tier():
+    assistant = TieredAssistant.__new__(TieredAssistant)
+    assistant.threshold = 1
+    assistant.tiers = {"small": RecordingTier(), "base": RecordingTier()}
+    assistant._lock = threading.Lock()
+    assistant.stats = {tier: {"requests": 0, "total_seconds": 0.0} for tier in assistant.tiers}
+
+    context = "Previous question: What is an ETF?"
+    assistant.generate_response("And how is it taxed?", context=context)
+
+    assert assistant.tiers["base"].calls == [("And how is it taxed?", context)]
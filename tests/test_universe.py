@@ -0,0 +1,28 @@
+import pytest
+
+from universe import parse_screen_request
+
+
+@pytest.mark.parametrize("question", [
+    "Which credit card is best for purchases over $500?",
+    "Which is better if I have over $1000 to invest?",
+    "Which fund should I pick if inflation is up 3%?",
+    "Which stocks should I buy if the market is up 3%?",
+    "My portfolio lost 10% this year, what should I do?",
+    "What is the stock market up to?"
+])
+def test_advice_questions_are_not_screens(question):
+    assert parse_screen_request(question) is None
+
+
+@pytest.mark.parametrize("question, scope", [
+    ("Which of my watchlist is up more than 5% this week?", "watchlist"),
+    ("Which stocks are up more than 3% today?", "universe"),
+    ("Any of my holdings down more than 10% this month?", "holdings"),
+    ("Screen my watchlist for unusual volume", "watchlist"),
+    ("Top 3 losers in my holdings this year", "holdings")
+])
+def test_screening_questions(question, scope):
+    spec = parse_screen_request(question)
+    assert spec is not None
+    assert spec["scope"] == scope
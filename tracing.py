@@ -0,0 +1,107 @@
+"""
+Opt-in capture of chat turns to a rotating JSONL trace.
+
+Each line records one turn: the question, a hashed snapshot of the user's
+profile, the intent that answered, per-stage timings and the response size.
+Stored values are never written. The profile is reduced to a hash and the
+number of data keys, holdings and debts, which is enough for the replay tool
+to rebuild a session of the same shape.
+
+Tracing is off unless TRACE_FILE is set:
+    TRACE_FILE=logs/traces.jsonl streamlit run app.py
+    python -m benchmarks.replay_traces logs/traces.jsonl --concurrency 8 --rate 20
+"""
+import glob
+import hashlib
+import json
+import logging
+import os
+import time
+from logging.handlers import RotatingFileHandler
+
+DEFAULT_MAX_BYTES = 10 * 2 ** 20
+DEFAULT_BACKUP_COUNT = 5
+
+
+def profile_snapshot(session):
+    """Hash the user's data, holdings, debts and watchlist, keeping only their sizes in the clear."""
+    payload = json.dumps(
+        {"user_data": session.user_data, "holdings": session.holdings, "debts": session.debts,
+         "watchlist": session.watchlist},
+        sort_keys=True,
+        default=str
+    )
+    return {
+        "hash": hashlib.sha256(payload.encode("utf-8")).hexdigest()[:16],
+        "user_data_keys": len(session.user_data),
+        "holdings": len(session.holdings),
+        "debts": len(session.debts),
+        "watchlist": len(session.watchlist)
+    }
+
+
+class TraceRecorder:
+    """
+    Appends one JSON line per chat turn, rotating the file at max_bytes and
+    keeping backup_count old files. Safe to share between sessions and threads.
+    """
+
+    def __init__(self, path, max_bytes=DEFAULT_MAX_BYTES, backup_count=DEFAULT_BACKUP_COUNT):
+        self.path = path
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        handler = RotatingFileHandler(path, maxBytes=max_bytes, backupCount=backup_count, encoding="utf-8")
+        handler.setFormatter(logging.Formatter("%(message)s"))
+        # A private logger per file, so traces never reach the root logger
+        self._logger = logging.getLogger(f"{__name__}.{os.path.abspath(path)}")
+        self._logger.setLevel(logging.INFO)
+        self._logger.propagate = False
+        self._logger.handlers = [handler]
+
+    def record(self, question, profile, result, session_id=None, total_ms=None):
+        """
+        Append one turn. profile is the profile_snapshot taken before the turn
+        ran and result the dict returned by engine.ask_question.
+        """
+        self._logger.info(json.dumps({
+            "ts": time.time(),
+            "session": session_id,
+            "question": question,
+            "profile": profile,
+            "intent": result["intent"],
+            "timings_ms": {stage: round(ms, 3) for stage, ms in result["timings"].items()},
+            "total_ms": round(total_ms, 3) if total_ms is not None else None,
+            "response_chars": len(result["response"]),
+            "figures": len(result["figures"])
+        }))
+
+
+def recorder_from_env():
+    """Return a TraceRecorder if TRACE_FILE is set (TRACE_MAX_BYTES, TRACE_BACKUPS optional), else None."""
+    path = os.environ.get("TRACE_FILE")
+    if not path:
+        return None
+    return TraceRecorder(
+        path,
+        max_bytes=int(os.environ.get("TRACE_MAX_BYTES", DEFAULT_MAX_BYTES)),
+        backup_count=int(os.environ.get("TRACE_BACKUPS", DEFAULT_BACKUP_COUNT))
+    )
+
+
+def load_traces(path):
+    """
+    Read the turns from a trace file and its rotated backups (path.1, path.2, ...),
+    ordered by time.
+    Malformed lines (e.g. one cut short by a crash) are skipped.
+    """
+    paths = [p for p in glob.glob(glob.escape(path) + ".*") if p.rsplit(".", 1)[1].isdigit()]
+    if os.path.exists(path):
+        paths.append(path)
+    turns = []
+    for p in paths:
+        with open(p, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    turns.append(json.loads(line))
+                except json.JSONDecodeError:
+                    continue
+    return sorted(turns, key=lambda turn: turn.get("ts", 0))
@@ -0,0 +1,335 @@
+"""
+Compact in-memory price universe and a vectorised stock screener.
+
+PriceUniverse keeps the last year of daily closes and volumes for every
+loaded ticker in one contiguous float32 block of shape (2, tickers, days),
+aligned on a shared trading calendar. A few thousand tickers fit in about ten
+megabytes. screen() evaluates filters and rankings over the whole block (or a
+subset of rows) in a single vectorised pass, so "which of my watchlist is up
+more than 5% this week" costs the same whether it covers five tickers or five
+thousand.
+
+The universe for unscoped questions ("top gainers today") comes from the
+UNIVERSE environment variable (comma-separated tickers) or UNIVERSE_FILE (one
+ticker per line), plus every ticker loaded so far.
+"""
+import os
+import re
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from market_data import DEFAULT_TTLS, get_provider
+
+UNIVERSE_DAYS = 260  # A year of trading days plus some slack for holidays
+MAX_FETCH_WORKERS = 8
+VOLUME_LOOKBACK = 20
+MIN_VOLATILITY_DAYS = 5
+
+PERIOD_DAYS = {"day": 1, "week": 5, "month": 21, "quarter": 63, "year": 252}
+PERIOD_LABELS = {1: "today", 5: "over the past week", 21: "over the past month", 63: "over the past quarter", 252: "over the past year"}
+
+# Column name and format for each metric in screen results
+METRIC_COLUMNS = {
+    "price": ("Price", "${:,.2f}"),
+    "change": ("Change %", "{:+.2f}%"),
+    "volume_ratio": ("Volume vs 20d Avg", "{:.1f}x"),
+    "volatility": ("Volatility %", "{:.1f}%"),
+    "from_high": ("From 1y High %", "{:+.1f}%")
+}
+
+_OPS = {">": np.greater, ">=": np.greater_equal, "<": np.less, "<=": np.less_equal}
+
+Snapshot = namedtuple("Snapshot", ["tickers", "index", "dates", "block"])
+
+
+class PriceUniverse:
+    """
+    Aligned close/volume arrays for many tickers. Readers work on an immutable
+    Snapshot; loading new tickers builds a new block and swaps it in.
+    """
+
+    def __init__(self, days=UNIVERSE_DAYS, ttl_s=DEFAULT_TTLS["history"], provider=None):
+        self.days = days
+        self.ttl_s = ttl_s
+        self._provider = provider
+        self._lock = threading.Lock()
+        # ticker -> (fetched_at, trading days as int64 day numbers, closes, volumes), or data None if unavailable
+        self._raw = {}
+        self.snapshot = Snapshot([], {}, np.array([], dtype="datetime64[D]"), np.empty((2, 0, 0), dtype=np.float32))
+
+    @property
+    def provider(self):
+        return self._provider or get_provider()
+
+    def _fetch(self, ticker):
+        try:
+            history = self.provider.get_history(ticker, period="1y")
+        except Exception as e:
+            print(f"Universe fetch of {ticker} failed: {e}")
+            return None
+        if history is None or history.empty:
+            return None
+        index = history.index
+        if index.tz is not None:
+            index = index.tz_localize(None)
+        days = index.normalize().values.astype("datetime64[D]").astype(np.int64)
+        closes = history["Close"].to_numpy(dtype=np.float32)
+        volumes = history["Volume"].to_numpy(dtype=np.float32) if "Volume" in history else np.full(len(closes), np.nan, np.float32)
+        return days, closes, volumes
+
+    def ensure(self, tickers):
+        """
+        Load tickers that are missing or older than the TTL, rebuilding the block
+        if anything changed. Returns the requested tickers that have data.
+        """
+        tickers = list(dict.fromkeys(t.upper() for t in tickers))
+        now = time.time()
+        with self._lock:
+            stale = [t for t in tickers if t not in self._raw or now - self._raw[t][0] > self.ttl_s]
+        if stale:
+            with ThreadPoolExecutor(max_workers=min(MAX_FETCH_WORKERS, len(stale))) as pool:
+                fetched = list(pool.map(self._fetch, stale))
+            with self._lock:
+                for ticker, data in zip(stale, fetched):
+                    self._raw[ticker] = (now, data)
+                self._rebuild()
+        index = self.snapshot.index
+        return [t for t in tickers if t in index]
+
+    def _rebuild(self):
+        loaded = [(t, data) for t, (_, data) in self._raw.items() if data is not None]
+        if not loaded:
+            return
+        tickers = [t for t, _ in loaded]
+        days = np.concatenate([data[0] for _, data in loaded])
+        calendar = np.unique(days)[-self.days:]
+
+        # Scatter every (ticker, day) observation into its calendar slot
+        rows = np.repeat(np.arange(len(loaded)), [len(data[0]) for _, data in loaded])
+        cols = np.searchsorted(calendar, days)
+        valid = (cols < len(calendar)) & (calendar[np.minimum(cols, len(calendar) - 1)] == days)
+        block = np.full((2, len(tickers), len(calendar)), np.nan, dtype=np.float32)
+        block[0, rows[valid], cols[valid]] = np.concatenate([data[1] for _, data in loaded])[valid]
+        block[1, rows[valid], cols[valid]] = np.concatenate([data[2] for _, data in loaded])[valid]
+
+        # Carry closes forward over days a ticker did not trade (volume stays missing)
+        filled = np.where(np.isnan(block[0]), 0, np.arange(len(calendar)))
+        np.maximum.accumulate(filled, axis=1, out=filled)
+        block[0] = np.take_along_axis(block[0], filled, axis=1)
+
+        self.snapshot = Snapshot(tickers, {t: i for i, t in enumerate(tickers)}, calendar.astype("datetime64[D]"), block)
+
+    def tickers(self):
+        return list(self.snapshot.tickers)
+
+    def nbytes(self):
+        return self.snapshot.block.nbytes
+
+
+def compute_metrics(closes, volumes, window):
+    """Every screening metric for each row of (tickers, days) close and volume arrays."""
+    days = closes.shape[1]
+    window = max(1, min(window, days - 1))
+    last = closes[:, -1]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        change = (last / closes[:, -1 - window] - 1) * 100
+        average_volume = np.nanmean(volumes[:, -1 - VOLUME_LOOKBACK:-1], axis=1)
+        volume_ratio = volumes[:, -1] / average_volume
+        span = max(window, MIN_VOLATILITY_DAYS)
+        returns = np.diff(np.log(closes[:, -1 - span:]), axis=1)
+        volatility = np.nanstd(returns, axis=1) * np.sqrt(252) * 100
+        from_high = (last / np.nanmax(closes, axis=1) - 1) * 100
+    return {"price": last, "change": change, "volume_ratio": volume_ratio, "volatility": volatility, "from_high": from_high}
+
+
+def screen(universe, tickers=None, window=5, filters=(), sort="change", descending=True, limit=None):
+    """
+    Filter and rank the universe in one vectorised pass.
+
+    tickers restricts the screen to those rows (default: the whole universe).
+    filters is a sequence of (metric, op, value) with op one of > >= < <=, and
+    sort a metric name or "abs_change" (largest moves either way). Returns a
+    DataFrame of matching tickers in ranked order with every metric.
+    """
+    snapshot = universe.snapshot
+    if tickers is None:
+        names = snapshot.tickers
+        closes, volumes = snapshot.block[0], snapshot.block[1]
+    else:
+        names = [t for t in tickers if t in snapshot.index]
+        rows = np.array([snapshot.index[t] for t in names], dtype=np.int64)
+        closes, volumes = snapshot.block[0, rows], snapshot.block[1, rows]
+    if len(names) == 0 or closes.shape[1] < 2:
+        return pd.DataFrame(columns=["Ticker"] + [column for column, _ in METRIC_COLUMNS.values()])
+
+    metrics = compute_metrics(closes, volumes, window)
+    key = np.abs(metrics["change"]) if sort == "abs_change" else metrics[sort]
+    keep = ~np.isnan(key)
+    for metric, op, value in filters:
+        keep &= _OPS[op](metrics[metric], value)
+
+    matches = np.flatnonzero(keep)
+    order = matches[np.argsort(-key[matches] if descending else key[matches], kind="stable")]
+    if limit:
+        order = order[:limit]
+    result = pd.DataFrame({"Ticker": [names[i] for i in order]})
+    for metric, (column, _) in METRIC_COLUMNS.items():
+        result[column] = metrics[metric][order].astype(np.float64)
+    return result
+
+
+def universe_from_env():
+    """Tickers named by UNIVERSE (comma-separated) and UNIVERSE_FILE (one per line)."""
+    tickers = [t.strip().upper() for t in os.environ.get("UNIVERSE", "").split(",") if t.strip()]
+    path = os.environ.get("UNIVERSE_FILE")
+    if path and os.path.exists(path):
+        with open(path) as f:
+            tickers.extend(line.strip().upper() for line in f if line.strip() and not line.startswith("#"))
+    return list(dict.fromkeys(tickers))
+
+
+_PERIOD_PATTERN = re.compile(r'\b(?:(\d+)[- ]?(day|week|month)s?|today|(day|week|month|quarter|year))\b', re.IGNORECASE)
+_MOVE_PATTERN = re.compile(
+    r'\b(up|gained|rose|climbed|down|lost|fell|dropped|declined)\b'
+    r'(?:\s+(?:by\s+)?(more than|over|at least|less than|under|above|below)?\s*(\d+(?:\.\d+)?)\s*(?:%|percent))?',
+    re.IGNORECASE
+)
+_RANK_PATTERN = re.compile(
+    r'\b(?:top|best|worst|biggest|largest)\s*(\d+)?\s*(movers|gainers|losers|performers|winners|decliners)\b',
+    re.IGNORECASE
+)
+_BARE_RANK_PATTERN = re.compile(r'\b(movers|gainers|losers)\b', re.IGNORECASE)
+_PRICE_PATTERN = re.compile(r'\b(above|over|below|under)\s+\$(\d+(?:\.\d+)?)', re.IGNORECASE)
+_VOLUME_PATTERN = re.compile(r'\b(?:unusual|high|heavy)\s+volume\b|\bvolume\s+spikes?\b', re.IGNORECASE)
+_SCOPE_PATTERNS = [
+    (re.compile(r'\bwatch ?list\b', re.IGNORECASE), "watchlist"),
+    (re.compile(r'\b(?:holdings|portfolio|positions|my stocks)\b', re.IGNORECASE), "holdings"),
+    (re.compile(r'\b(?:market|universe|all stocks|any stocks?)\b', re.IGNORECASE), "universe")
+]
+# Phrases that ask for a list of tickers, naming stocks or a scope explicitly.
+# A scope word plus a move ("my portfolio lost 10%") is not enough, and neither
+# is a bare "which" ("which credit card is best for purchases over $500"), nor
+# an advice question ("which stocks should I buy").
+_STOCK_NOUNS = r'(?:stocks?|tickers?|names|shares|equities|companies|holdings|positions|portfolio|watch ?list)'
+_SCREEN_PHRASE_PATTERN = re.compile(
+    r'\b(?:which|what|any)\s+(?:(?:of|in)\s+)?(?:my\s+|the\s+|our\s+)?' + _STOCK_NOUNS +
+    r'\b(?!\s+(?:should|could|would|do|to)\b)'
+    r'|\bscreen\s+(?:(?:for|my|the)\s+)*(?:' + _STOCK_NOUNS + r'|market|universe)\b'
+    r'|\b(?:show|list)\s+(?:me\s+)?(?:the\s+)?(?:stocks|tickers|names)\b',
+    re.IGNORECASE
+)
+_DOWN_WORDS = {"down", "lost", "fell", "dropped", "declined"}
+_WITHIN_WORDS = {"less than", "under", "below"}
+_FALLING_RANKS = {"losers", "decliners"}
+
+
+def move_filters(falling, threshold, within):
+    """
+    Change filters for a move. 'up more than 5%' is change > 5; 'up less than 5%'
+    is the band 0 < change < 5, and likewise for falls.
+    """
+    if falling:
+        if within and threshold:
+            return [("change", "<", 0.0), ("change", ">", -threshold)]
+        return [("change", "<", -threshold or 0.0)]
+    if within and threshold:
+        return [("change", ">", 0.0), ("change", "<", threshold)]
+    return [("change", ">", threshold)]
+
+
+def parse_screen_request(question):
+    """
+    Parse a screening question such as 'which of my watchlist is up more than 5%
+    this week' or 'top 3 movers in my holdings'. Returns a spec dict with scope,
+    window, filters, sort, descending and limit, or None if it isn't one.
+
+    A question is only a screen if it asks for a ranking ('top 5 gainers') or
+    uses a screening phrase that names stocks or a scope ('which stocks',
+    'any of my holdings', 'screen my watchlist') together with a move, price
+    or volume condition.
+    """
+    rank = _RANK_PATTERN.search(question)
+    screen_phrase = _SCREEN_PHRASE_PATTERN.search(question)
+    if not rank and screen_phrase:
+        rank = _BARE_RANK_PATTERN.search(question)
+    move = _MOVE_PATTERN.search(question)
+    price = _PRICE_PATTERN.search(question)
+    volume = _VOLUME_PATTERN.search(question)
+    if not (rank or (screen_phrase and (move or price or volume))):
+        return None
+    scope = next((name for pattern, name in _SCOPE_PATTERNS if pattern.search(question)), "universe")
+
+    window = PERIOD_DAYS["day"] if rank or volume else PERIOD_DAYS["week"]
+    period = _PERIOD_PATTERN.search(question)
+    if period:
+        if period.group(1):
+            window = int(period.group(1)) * PERIOD_DAYS[period.group(2).lower()]
+        elif period.group(3):
+            window = PERIOD_DAYS[period.group(3).lower()]
+        else:
+            window = PERIOD_DAYS["day"]
+
+    spec = {"scope": scope, "window": window, "filters": [], "sort": "change", "descending": True, "limit": None}
+    if move:
+        falling = move.group(1).lower() in _DOWN_WORDS
+        threshold = float(move.group(3)) if move.group(3) else 0.0
+        within = (move.group(2) or "").lower() in _WITHIN_WORDS
+        spec["filters"].extend(move_filters(falling, threshold, within))
+        spec["descending"] = not falling
+    if price:
+        spec["filters"].append(("price", ">" if price.group(1).lower() in ("above", "over") else "<", float(price.group(2))))
+    if volume:
+        spec["filters"].append(("volume_ratio", ">", 2.0))
+        spec["sort"] = "volume_ratio"
+    if rank:
+        kind = rank.group(rank.lastindex).lower()
+        spec["limit"] = int(rank.group(1)) if rank.re is _RANK_PATTERN and rank.group(1) else 5
+        if kind == "movers":
+            spec["sort"] = "abs_change"
+        elif kind in _FALLING_RANKS or re.search(r'\bworst\b', question, re.IGNORECASE):
+            spec["descending"] = False
+    return spec
+
+
+def _describe_change(value, op):
+    """Describe one change filter from its own op and sign."""
+    if op in (">", ">="):
+        return f"up more than {value:g}%" if value > 0 else ("up" if value == 0 else f"down less than {-value:g}%")
+    return f"down more than {-value:g}%" if value < 0 else ("down" if value == 0 else f"up less than {value:g}%")
+
+
+def describe_screen(spec):
+    """Plain-English summary of a screen spec, e.g. 'up more than 5% over the past week'."""
+    period = PERIOD_LABELS.get(spec["window"], f"over the past {spec['window']} trading days")
+    parts = []
+    changes = [(value, op) for metric, op, value in spec["filters"] if metric == "change"]
+    lower = [value for value, op in changes if op in (">", ">=")]
+    upper = [value for value, op in changes if op in ("<", "<=")]
+    if lower and upper:
+        # A band from a 'less than' move: 0 < change < 5 is 'up less than 5%'
+        low, high = max(lower), min(upper)
+        if low == 0:
+            parts.append(f"up less than {high:g}%")
+        elif high == 0:
+            parts.append(f"down less than {-low:g}%")
+        else:
+            parts.append(f"changed between {low:+g}% and {high:+g}%")
+    else:
+        parts.extend(_describe_change(value, op) for value, op in changes)
+    for metric, op, value in spec["filters"]:
+        if metric == "price":
+            parts.append(f"priced {'above' if op in ('>', '>=') else 'below'} ${value:,.2f}")
+        elif metric == "volume_ratio":
+            parts.append(f"trading over {value:g}x their usual volume")
+    if spec["limit"] and not parts:
+        kind = "movers" if spec["sort"] == "abs_change" else ("gainers" if spec["descending"] else "losers")
+        return f"top {spec['limit']} {kind} {period}"
+    return " and ".join(parts) + f" {period}"
+
+
+price_universe = PriceUniverse()